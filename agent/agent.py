@@ -1,8 +1,11 @@
-import json
+import asyncio
 import os
+import time
 
 # Import our custom tools
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import (
     Any,
     Dict,
@@ -13,31 +16,67 @@ from typing import (
 from langchain_core.messages import (
     HumanMessage,
     ToolMessage,
+    message_chunk_to_message,
 )
 from langchain_core.prompts import (
     ChatPromptTemplate,
     MessagesPlaceholder,
 )
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 # Import LangGraph components
+from langgraph.config import get_stream_writer
 from langgraph.func import entrypoint, task
 from langgraph.graph.message import add_messages
 from pydantic import SecretStr
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from tools.fda_tool import get_adverse_events
+from agent.semantic_cache import SemanticCache
+from agent.serialization import compact_json, records_table, serialize_tool_output
+from tools.fda_tool import (
+    count_adverse_events,
+    format_adverse_event_counts,
+    get_adverse_events,
+    get_adverse_events_async,
+)
 from tools.neo4j_tool import Neo4jTool
 from tools.pdf_rag_tool import PDFTool
 
+# Columns of the raw adverse event tables handed to the model
+FDA_REPORT_COLUMNS = [
+    "receivedate",
+    "safetyreportid",
+    "drug_names",
+    "reactions",
+    "outcomes",
+]
+
+# Tool calls of a model round run concurrently on this bounded pool. Each
+# call waits at most its tool's timeout, and never past the request deadline;
+# a call that times out keeps its worker until the tool returns.
+TOOL_WORKERS = int(os.getenv("AGENT_TOOL_WORKERS", "8"))
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("AGENT_TOOL_TIMEOUT", "30"))
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "fda_adverse_events_tool": DEFAULT_TOOL_TIMEOUT,
+    "fda_adverse_event_summary_tool": DEFAULT_TOOL_TIMEOUT,
+    "fda_compare_adverse_events_tool": 1.5 * DEFAULT_TOOL_TIMEOUT,
+    "neo4j_query_tool": DEFAULT_TOOL_TIMEOUT,
+    "pdf_search_tool": DEFAULT_TOOL_TIMEOUT,
+}
+REQUEST_TIMEOUT = float(os.getenv("AGENT_REQUEST_TIMEOUT", "90"))
+tool_executor = ThreadPoolExecutor(
+    max_workers=TOOL_WORKERS, thread_name_prefix="agent-tool"
+)
+
 # Global variables for tools and model
 neo4j_tool: Optional[Neo4jTool] = None
 pdf_tool: Optional[PDFTool] = None
 model: Optional[ChatOpenAI] = None
 tools: List = []
 tools_by_name: Dict[str, Any] = {}
+semantic_cache: Optional[SemanticCache] = None
 _initialized = False  # Flag to track if agent has been initialized
 
 
@@ -51,15 +90,94 @@ def fda_adverse_events_tool(drug_name: str, limit: int = 10) -> str:
         limit: Maximum number of results to return (default: 10)
 
     Returns:
-        JSON string containing adverse events data
+        Table of adverse event reports, one per line
     """
     try:
         results = get_adverse_events(drug_name, limit)
-        return json.dumps(results, indent=2)
+        return serialize_tool_output(
+            "fda_adverse_events_tool",
+            results,
+            render=lambda rows: records_table(rows, FDA_REPORT_COLUMNS),
+        )
+    except Exception as e:
+        return f"Error retrieving FDA data: {str(e)}"
+
+
+@tool
+def fda_adverse_event_summary_tool(drug_name: str, top_n: int = 10) -> str:
+    """Summarize all FDA adverse event reports for a drug in a compact table.
+
+    Prefer this over fetching raw reports for questions like "what adverse
+    events are reported for X": it covers every report, not a sample.
+
+    Args:
+        drug_name: The name of the drug to search for (e.g., "TRAMADOL")
+        top_n: Number of most frequently reported reactions to list (default: 10)
+
+    Returns:
+        Table of report counts by reaction, outcome and seriousness
+    """
+    try:
+        counts = count_adverse_events(drug_name)
+        return serialize_tool_output(
+            "fda_adverse_event_summary_tool",
+            counts,
+            render=lambda counts: format_adverse_event_counts(
+                drug_name, counts, top_n
+            ),
+        )
     except Exception as e:
         return f"Error retrieving FDA data: {str(e)}"
 
 
+@tool
+def fda_compare_adverse_events_tool(drug_names: List[str], limit: int = 10) -> str:
+    """Get adverse events data for several drugs at once from the FDA database.
+
+    Use this instead of repeated single-drug calls when comparing drugs.
+
+    Args:
+        drug_names: The drugs to look up (e.g. ["ASPIRIN", "IBUPROFEN"])
+        limit: Maximum number of results to return per drug (default: 10)
+
+    Returns:
+        One table of adverse event reports per drug
+    """
+    try:
+        results = asyncio.run(get_adverse_events_async(drug_names, limit))
+        return serialize_tool_output(
+            "fda_compare_adverse_events_tool",
+            results,
+            render=lambda results: "\n\n".join(
+                f"## {name}\n"
+                + (
+                    reports
+                    if isinstance(reports, str)
+                    else records_table(reports, FDA_REPORT_COLUMNS)
+                )
+                for name, reports in results.items()
+            ),
+        )
+    except Exception as e:
+        return f"Error retrieving FDA data: {str(e)}"
+
+
+def render_graph_result(result) -> str:
+    """The answer or template rows of ``Neo4jTool.ask_question``, without the query.
+
+    Chain answers are text; template rows become a records table.
+    """
+    if not isinstance(result, dict):
+        return str(result)
+    rows = result.get("result")
+    if isinstance(rows, str):
+        return rows
+    if rows and all(isinstance(row, dict) for row in rows):
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        return records_table(rows, columns)
+    return compact_json(rows)
+
+
 @tool
 def neo4j_query_tool(question: str) -> str:
     """Query the Neo4j knowledge graph with natural language questions.
@@ -75,20 +193,31 @@ def neo4j_query_tool(question: str) -> str:
         if neo4j_tool is None:
             return "Error: Neo4j tool not initialized"
         result = neo4j_tool.ask_question(question)
-        return str(result)
+        return serialize_tool_output(
+            "neo4j_query_tool", result, render=render_graph_result, baseline=str
+        )
     except Exception as e:
         return f"Error querying Neo4j: {str(e)}"
 
 
 @tool
-def pdf_search_tool(question: str) -> str:
-    """Search the PDF document for information and generate answers.
+def pdf_search_tool(
+    question: str,
+    year: Optional[int] = None,
+    document: Optional[str] = None,
+    mode: str = "hybrid",
+) -> str:
+    """Search the company report PDFs for information and generate answers.
 
     Args:
         question: Question about the PDF content
+        year: Only search reports covering this year (e.g. 2023)
+        document: Only search reports whose file name contains this text
+        mode: "hybrid" (default), "vector" for semantic matching only, or
+            "keyword" for exact figures, years and product names
 
     Returns:
-        JSON string containing both the retrieved documents and the generated answer
+        The generated answer followed by the sources it was based on
     """
     global pdf_tool
     try:
@@ -99,7 +228,9 @@ def pdf_search_tool(question: str) -> str:
         if not hasattr(pdf_tool, 'vector_store') or pdf_tool.vector_store is None:
             return "Error: PDF vector store not initialized. The PDF file may not have been loaded successfully during initialization."
         
-        docs, answer = pdf_tool.search_text(question)
+        docs, answer = pdf_tool.search_text(
+            question, year=year, document=document, mode=mode
+        )
 
         # Convert Document objects to serializable format
         serializable_docs = []
@@ -115,14 +246,26 @@ def pdf_search_tool(question: str) -> str:
             "total_documents": len(docs),
         }
 
-        return json.dumps(result, indent=2)
+        # The answer already distills the chunks, so only cite where it came from
+        def render(result):
+            sources = []
+            for i, doc in enumerate(result["retrieved_documents"], 1):
+                metadata = doc["metadata"]
+                name = metadata.get("document", metadata.get("source", "?"))
+                page = metadata.get("page")
+                page = "?" if page is None else page + 1
+                sources.append(f"[{i}] {name}, page {page}")
+            return "\n".join([result["answer"], "Sources:", *sources])
+
+        return serialize_tool_output("pdf_search_tool", result, render=render)
     except Exception as e:
         return f"Error searching PDF: {str(e)}"
 
 
 def reset_agent():
     """Reset the agent to allow reinitialization with new configuration"""
-    global neo4j_tool, pdf_tool, model, tools, tools_by_name, _initialized
+    global neo4j_tool, pdf_tool, model, tools, tools_by_name, semantic_cache
+    global _initialized
 
     # Close existing connections
     if neo4j_tool:
@@ -134,6 +277,7 @@ def reset_agent():
     model = None
     tools = []
     tools_by_name = {}
+    semantic_cache = None
     _initialized = False
 
     print("🔄 Agent reset completed")
@@ -143,7 +287,8 @@ def initialize_agent_with_config(
     openai_api_key: str, neo4j_uri: str, neo4j_username: str, neo4j_password: str
 ):
     """Initialize the agent with user-provided configuration"""
-    global neo4j_tool, pdf_tool, model, tools, tools_by_name, _initialized
+    global neo4j_tool, pdf_tool, model, tools, tools_by_name, semantic_cache
+    global _initialized
 
     # Only initialize once
     if _initialized:
@@ -162,16 +307,15 @@ def initialize_agent_with_config(
 
     # Initialize PDF tool vector store
     try:
-        # Try multiple possible paths for the PDF file
+        # Try multiple possible paths for the PDF corpus directory
         possible_paths = [
             # Current working directory relative path
-            "./tools/pdf_data/report_2023_2024.pdf",
+            "./tools/pdf_data",
             # Absolute path from current file
             os.path.join(
                 os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
                 "tools",
                 "pdf_data",
-                "report_2023_2024.pdf",
             ),
             # Path relative to the agent directory
             os.path.join(
@@ -179,29 +323,28 @@ def initialize_agent_with_config(
                 "..",
                 "tools",
                 "pdf_data",
-                "report_2023_2024.pdf",
             ),
         ]
         
         print(f"🔍 Current working directory: {os.getcwd()}")
         print(f"🔍 Agent file location: {os.path.abspath(__file__)}")
-        print(f"🔍 Trying PDF paths: {possible_paths}")
+        print(f"🔍 Trying PDF corpus paths: {possible_paths}")
         
-        pdf_path = None
+        corpus_path = None
         for path in possible_paths:
-            exists = os.path.exists(path)
+            exists = os.path.isdir(path)
             print(f"🔍 Path {path}: {'✅ EXISTS' if exists else '❌ NOT FOUND'}")
             if exists:
-                pdf_path = path
+                corpus_path = path
                 break
         
-        if pdf_path is None:
-            print(f"⚠️ PDF file not found. Tried paths: {possible_paths}")
+        if corpus_path is None:
+            print(f"⚠️ PDF corpus not found. Tried paths: {possible_paths}")
             print(f"⚠️ Current directory contents: {os.listdir('.')}")
-            raise FileNotFoundError("PDF file not found in any expected location")
+            raise FileNotFoundError("PDF corpus not found in any expected location")
         
-        print(f"📄 Using PDF path: {pdf_path}")
-        pdf_tool.create_vector_store(pdf_path)
+        print(f"📄 Using PDF corpus: {corpus_path}")
+        pdf_tool.create_vector_store(corpus_path)
         print("✅ PDF vector store initialized")
     except Exception as e:
         print(f"⚠️ PDF vector store initialization failed: {e}")
@@ -221,19 +364,38 @@ def initialize_agent_with_config(
     model = ChatOpenAI(model="gpt-4", temperature=0, api_key=SecretStr(openai_api_key))
 
     # Create the tools list
-    tools = [fda_adverse_events_tool, neo4j_query_tool, pdf_search_tool]
+    tools = [
+        fda_adverse_events_tool,
+        fda_adverse_event_summary_tool,
+        fda_compare_adverse_events_tool,
+        neo4j_query_tool,
+        pdf_search_tool,
+    ]
 
     # Create tools by name mapping
     tools_by_name = {tool.name: tool for tool in tools}
 
+    # Semantic cache of final answers to past questions
+    semantic_cache = SemanticCache(
+        OpenAIEmbeddings(
+            model="text-embedding-3-small", api_key=SecretStr(openai_api_key)
+        ),
+        threshold=float(os.getenv("AGENT_SEMANTIC_CACHE_THRESHOLD", "0.9")),
+        max_entries=int(os.getenv("AGENT_SEMANTIC_CACHE_SIZE", "512")),
+        ttl=float(os.getenv("AGENT_SEMANTIC_CACHE_TTL", "3600")),
+    )
+
     _initialized = True
     print("✅ Agent initialized with user configuration")
 
 
 # Define tasks
 @task
-def call_model(messages):
-    """Call model with a sequence of messages."""
+def call_model(messages, use_tools: bool = True):
+    """Call model with a sequence of messages.
+
+    With ``use_tools=False`` the model must answer without calling tools.
+    """
     if not model:
         raise ValueError(
             "Model not initialized. Call initialize_agent_with_config() first."
@@ -241,9 +403,9 @@ def call_model(messages):
 
     system_prompt = """You are a helpful AI assistant with access to three specialized tools:
 
-1. FDA Adverse Events Tool: Get adverse events data for drugs from the FDA database
+1. FDA Adverse Events Tools: Get adverse events data for drugs from the FDA database (use the summary tool for overall reaction, outcome and seriousness counts, the raw reports tool for individual cases, and the compare tool to fetch several drugs in one call)
 2. Neo4j Knowledge Graph Tool: Query a pharmaceutical knowledge graph with natural language
-3. PDF Search Tool: Search and answer questions about a pharmaceutical company report
+3. PDF Search Tool: Search and answer questions about the pharmaceutical company's annual reports (filterable by year)
 
 When a user asks a question, think about which tool(s) would be most helpful to answer it.
 You can use multiple tools if needed to provide a comprehensive answer.
@@ -256,53 +418,118 @@ Always provide clear, helpful responses and explain what information you found."
     )
 
     # Bind tools to the model
-    model_with_tools = model.bind_tools(tools)
+    model_with_tools = model.bind_tools(
+        tools, tool_choice=None if use_tools else "none"
+    )
 
     # Get the formatted messages
     formatted_messages = prompt.format_messages(messages=messages)
 
-    # Call the model
-    response = model_with_tools.invoke(formatted_messages)
-    return response
+    # Stream the model's tokens to run_agent_with_streaming as they arrive;
+    # the writer does nothing when the agent is not streamed
+    write = get_stream_writer()
+    response = None
+    for chunk in model_with_tools.stream(formatted_messages):
+        if chunk.content and isinstance(chunk.content, str):
+            write({"delta": chunk.content})
+        response = chunk if response is None else response + chunk
+    return message_chunk_to_message(response)
 
 
 @task
-def call_tool(tool_call):
-    """Execute a tool call and return the result as a ToolMessage."""
+def call_tool(tool_call, deadline: Optional[float] = None):
+    """Execute a tool call and return the result as a ToolMessage.
+
+    The tool runs on ``tool_executor`` and is waited for until its timeout
+    or the request ``deadline`` (a ``time.monotonic()`` value), whichever
+    comes first. A call that times out is answered with a structured error
+    message so the model can still answer from the other tools' results.
+    """
     if not tools_by_name:
         raise ValueError(
             "Tools not initialized. Call initialize_agent_with_config() first."
         )
 
-    tool = tools_by_name[tool_call["name"]]
-    observation = tool.invoke(tool_call["args"])
+    name = tool_call["name"]
+    tool = tools_by_name[name]
+    timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+    if deadline is not None:
+        timeout = min(timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            # Out of time: do not tie up a worker for a call nobody waits for
+            print(f"⏱️ {name} skipped, request deadline passed")
+            return _timeout_message(tool_call, 0.0)
+
+    future = tool_executor.submit(tool.invoke, tool_call["args"])
+    try:
+        observation = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        print(f"⏱️ {name} timed out after {timeout:.1f}s")
+        return _timeout_message(tool_call, timeout)
     return ToolMessage(content=observation, tool_call_id=tool_call["id"])
 
 
+def _timeout_message(tool_call, timeout: float) -> ToolMessage:
+    """Structured error result of a tool call that did not answer in time."""
+    observation = compact_json(
+        {
+            "status": "timeout",
+            "tool": tool_call["name"],
+            "timeout_seconds": round(timeout, 1),
+            "message": (
+                "The tool did not answer in time and returned no data. "
+                "Answer with the other results and say this source was "
+                "unavailable."
+            ),
+        }
+    )
+    return ToolMessage(
+        content=observation, tool_call_id=tool_call["id"], status="error"
+    )
+
+
 # Define entrypoint
 @entrypoint()
 def agent(messages):
     """Main agent entrypoint that orchestrates model calls and tool execution."""
+    deadline = time.monotonic() + REQUEST_TIMEOUT
     llm_response = call_model(messages).result()
     while True:
         if not llm_response.tool_calls:
             break
 
-        # Execute tools
+        # Execute tools concurrently; each result is bounded by its deadline
         tool_result_futures = [
-            call_tool(tool_call) for tool_call in llm_response.tool_calls
+            call_tool(tool_call, deadline) for tool_call in llm_response.tool_calls
         ]
         tool_results = [fut.result() for fut in tool_result_futures]
 
         # Append to message list
         messages = add_messages(messages, [llm_response, *tool_results])
 
+        if time.monotonic() >= deadline:
+            # Out of time: answer from the results so far, without more tools
+            llm_response = call_model(messages, use_tools=False).result()
+            break
+
         # Call model again
         llm_response = call_model(messages).result()
 
     return llm_response
 
 
+def _semantic_cache_lookup(question: str):
+    """Look up ``question`` in the semantic cache; failures count as misses."""
+    if semantic_cache is None:
+        return None, None
+    try:
+        return semantic_cache.lookup(question)
+    except Exception as e:
+        print(f"⚠️ Semantic cache lookup failed: {e}")
+        return None, None
+
+
 def run_agent(
     question: str,
     openai_api_key: Optional[str] = None,
@@ -323,12 +550,29 @@ def run_agent(
         elif not _initialized:
             return "Error: Agent not initialized. Please provide all configuration parameters."
 
+        # Answer from the semantic cache when a similar question was seen
+        cached, question_vector = _semantic_cache_lookup(question)
+        if cached is not None:
+            print(f"♻️ Semantic cache hit ({cached['similarity']:.3f})")
+            return cached["answer"]
+
         # Prepare the user message
         user_message = HumanMessage(content=question)
 
         # Run the agent
         result = agent.invoke([user_message])
 
+        if question_vector is not None and semantic_cache is not None:
+            final_step = {
+                "task_name": "call_model",
+                "content": result.content,
+                "step_type": "final_answer",
+                "is_final": True,
+            }
+            semantic_cache.store(
+                question, question_vector, result.content, [final_step]
+            )
+
         # Return the final response content
         return result.content
     except Exception as e:
@@ -355,8 +599,14 @@ def run_agent_with_streaming(
         dict: Step information with keys:
             - task_name: str
             - content: str
-            - step_type: str ('model_call', 'tool_call', 'final_answer')
+            - step_type: str ('model_call', 'tool_call', 'final_answer',
+              'cache_hit', 'delta')
             - is_final: bool (True for final answer)
+
+        'delta' steps carry the next tokens of the model's text as they are
+        generated. A model round that ends up calling tools may stream some
+        text too; the following 'tool_decision' step marks that text as not
+        being the answer. Deltas are not recorded in the cached steps.
     """
     try:
         # Initialize agent if configuration provided and not already initialized
@@ -376,11 +626,51 @@ def run_agent_with_streaming(
             }
             return
 
+        # Replay the answer from the semantic cache when a similar question
+        # was seen
+        cached, question_vector = _semantic_cache_lookup(question)
+        if cached is not None:
+            yield {
+                "task_name": "semantic_cache",
+                "content": (
+                    "♻️ Reusing the answer to a similar question "
+                    f"(similarity {cached['similarity']:.3f}):\n{cached['question']}"
+                ),
+                "step_type": "cache_hit",
+                "is_final": False,
+            }
+            steps = cached["steps"]
+            if not any(step["is_final"] for step in steps):
+                # Entries stored without steps only have their answer
+                steps = [
+                    *steps,
+                    {
+                        "task_name": "call_model",
+                        "content": cached["answer"],
+                        "step_type": "final_answer",
+                        "is_final": True,
+                    },
+                ]
+            yield from steps
+            return
+
         # Prepare the user message
         user_message = HumanMessage(content=question)
 
         # Stream the agent execution
-        for step in agent.stream([user_message]):
+        steps = []
+        for mode, step in agent.stream(
+            [user_message], stream_mode=["updates", "custom"]
+        ):
+            if mode == "custom":
+                yield {
+                    "task_name": "call_model",
+                    "content": step["delta"],
+                    "step_type": "delta",
+                    "is_final": False,
+                }
+                continue
+
             for task_name, message in step.items():
                 if task_name == "agent":
                     continue  # Skip the main agent step
@@ -421,12 +711,21 @@ def run_agent_with_streaming(
                         content = f"🔧 Executing tool...\n\nResult:\n{str(message)}"
                     step_type = "tool_execution"
 
-                yield {
+                step_data = {
                     "task_name": task_name,
                     "content": content,
                     "step_type": step_type,
                     "is_final": is_final,
                 }
+                steps.append(step_data)
+                yield step_data
+
+                if (
+                    is_final
+                    and question_vector is not None
+                    and semantic_cache is not None
+                ):
+                    semantic_cache.store(question, question_vector, content, steps)
 
     except Exception as e:
         error_msg = f"Error running agent: {str(e)}"
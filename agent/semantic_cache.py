@@ -0,0 +1,133 @@
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def _numbers(text: str) -> frozenset:
+    return frozenset(_NUMBER_PATTERN.findall(text))
+
+
+class SemanticCache:
+    """Final answers of past questions, looked up by embedding similarity.
+
+    Past questions are kept as a small matrix of unit-normalized embeddings.
+    A new question whose cosine similarity to a stored one reaches
+    ``threshold`` reuses that question's answer and steps. Questions that
+    mention different numbers (years, amounts) never match, since those
+    usually ask for different facts. Entries expire after ``ttl`` seconds and
+    the oldest are evicted beyond ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.9,
+        max_entries: int = 512,
+        ttl: float = 3600.0,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._entries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, question: str) -> np.ndarray:
+        """Unit-normalized embedding of ``question``."""
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self, question: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """Return the best matching entry (or None) and the question's embedding.
+
+        The embedding is returned so that ``store`` does not embed again.
+        """
+        vector = self.embed(question)
+        numbers = _numbers(question)
+        now = time.time()
+
+        with self._lock:
+            self._expire(now)
+            best = None
+            if self._entries:
+                similarities = self._vectors @ vector
+                for row in np.argsort(-similarities):
+                    if similarities[row] < self.threshold:
+                        break
+                    if self._entries[row]["numbers"] == numbers:
+                        best = {
+                            **self._entries[row],
+                            "similarity": float(similarities[row]),
+                        }
+                        break
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best, vector
+
+    def store(
+        self,
+        question: str,
+        vector: np.ndarray,
+        answer: str,
+        steps: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        """Remember the final answer (and steps) given to ``question``.
+
+        Error answers are not remembered, so a failing tool is retried.
+        """
+        if answer.startswith("Error"):
+            return
+        entry = {
+            "question": question,
+            "numbers": _numbers(question),
+            "answer": answer,
+            "steps": steps or [],
+            "created_at": time.time(),
+        }
+        with self._lock:
+            if len(self._entries) == 0:
+                self._vectors = vector[None, :].copy()
+            else:
+                self._vectors = np.vstack([self._vectors, vector])
+            self._entries.append(entry)
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._vectors = self._vectors[overflow:]
+                self._entries = self._entries[overflow:]
+
+    def _expire(self, now: float) -> None:
+        """Drop expired entries; entries are kept in insertion order."""
+        expired = 0
+        while (
+            expired < len(self._entries)
+            and now - self._entries[expired]["created_at"] > self.ttl
+        ):
+            expired += 1
+        if expired:
+            self._vectors = self._vectors[expired:]
+            self._entries = self._entries[expired:]
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and the hit rate since startup."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Token budgets per tool output; everything the tools return is re-sent to
+# the model on every later round of the ReAct loop.
+DEFAULT_TOKEN_BUDGET = int(os.getenv("AGENT_TOOL_TOKEN_BUDGET", "1500"))
+TOOL_TOKEN_BUDGETS: Dict[str, int] = {
+    "fda_adverse_events_tool": DEFAULT_TOKEN_BUDGET,
+    "fda_adverse_event_summary_tool": 800,
+    "fda_compare_adverse_events_tool": 2 * DEFAULT_TOKEN_BUDGET,
+    "neo4j_query_tool": DEFAULT_TOKEN_BUDGET,
+    "pdf_search_tool": 800,
+}
+# Measure each output against the indented-JSON baseline for
+# ``serialization_stats``; off by default as it re-encodes every result
+LOG_SERIALIZATION_STATS = (
+    os.getenv("AGENT_SERIALIZATION_STATS", "false").lower() == "true"
+)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Number of GPT-4 tokens in ``text``.
+
+    Falls back to a four-characters-per-token estimate when the tiktoken
+    encoding cannot be loaded (it is downloaded on first use).
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.encoding_for_model("gpt-4")
+                except Exception as e:
+                    print(f"⚠️ tiktoken unavailable, estimating token counts: {e}")
+                    _encoding = False
+    if _encoding is False:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text))
+
+
+def compact_json(value: Any) -> str:
+    """Minified JSON without ASCII escaping."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def indented_json(value: Any) -> str:
+    """Indented JSON, what tools returned before compact serialization."""
+    return json.dumps(value, indent=2, default=str)
+
+
+def records_table(records: Sequence[Dict[str, Any]], columns: List[str]) -> str:
+    """Render records as a ``|``-separated table; list values are joined by ``;``.
+
+    Nested mappings in list values are written as compact JSON.
+    """
+    lines = [" | ".join(columns)]
+    for record in records:
+        cells = []
+        for column in columns:
+            value = record.get(column, "")
+            if isinstance(value, (list, tuple)):
+                value = "; ".join(
+                    compact_json(item) if isinstance(item, dict) else str(item)
+                    for item in value
+                )
+            cells.append(str(value))
+        lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+def fit_to_budget(text: str, max_tokens: int) -> str:
+    """Truncate ``text`` at a line boundary so it fits in ``max_tokens``.
+
+    A trailing note tells the model how much was left out.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    lines = text.split("\n")
+    # Leave room for the truncation note
+    remaining = max_tokens - 20
+    kept = []
+    for line in lines:
+        cost = count_tokens(line) + 1
+        if cost > remaining:
+            if not kept:
+                # A single oversized line: cut it by characters, shrinking the
+                # cut until it measures within the budget
+                cut = line[: max(remaining, 0) * 4]
+                tokens = count_tokens(cut)
+                while cut and tokens > remaining:
+                    cut = cut[: min(len(cut) - 1, len(cut) * remaining // tokens)]
+                    tokens = count_tokens(cut)
+                kept.append(cut)
+            break
+        kept.append(line)
+        remaining -= cost
+    omitted = len(lines) - len(kept)
+    note = f"... [truncated {omitted} more lines to fit a {max_tokens}-token budget]"
+    return "\n".join(kept + [note])
+
+
+class SerializationStats:
+    """Bytes and tokens saved by compact tool outputs, per tool."""
+
+    def __init__(self):
+        self._tools: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool_name: str, baseline: str, output: str) -> Dict[str, int]:
+        """Record one tool call and return its own savings."""
+        call = {
+            "baseline_bytes": len(baseline.encode("utf-8")),
+            "output_bytes": len(output.encode("utf-8")),
+            "baseline_tokens": count_tokens(baseline),
+            "output_tokens": count_tokens(output),
+        }
+        with self._lock:
+            totals = self._tools.setdefault(
+                tool_name, {"calls": 0, **{key: 0 for key in call}}
+            )
+            totals["calls"] += 1
+            for key, value in call.items():
+                totals[key] += value
+        return call
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Totals per tool since startup, including bytes and tokens saved."""
+        with self._lock:
+            return {
+                tool_name: {
+                    **totals,
+                    "bytes_saved": totals["baseline_bytes"] - totals["output_bytes"],
+                    "tokens_saved": totals["baseline_tokens"]
+                    - totals["output_tokens"],
+                }
+                for tool_name, totals in self._tools.items()
+            }
+
+
+serialization_stats = SerializationStats()
+
+
+def serialize_tool_output(
+    tool_name: str,
+    value: Any,
+    render: Callable[[Any], str] = compact_json,
+    baseline: Callable[[Any], str] = indented_json,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """Encode a tool result compactly and within the tool's token budget.
+
+    With ``AGENT_SERIALIZATION_STATS`` enabled, the output is compared to
+    ``baseline(value)``, what the tool used to return (indented JSON by
+    default); the difference is logged and added to ``serialization_stats``.
+    """
+    budget = max_tokens or TOOL_TOKEN_BUDGETS.get(tool_name, DEFAULT_TOKEN_BUDGET)
+    output = fit_to_budget(render(value), budget)
+    if not LOG_SERIALIZATION_STATS:
+        return output
+
+    call = serialization_stats.record(tool_name, baseline(value), output)
+    print(
+        f"📉 {tool_name}: {call['baseline_bytes']} -> {call['output_bytes']} bytes, "
+        f"{call['baseline_tokens']} -> {call['output_tokens']} tokens"
+    )
+    return output
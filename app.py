@@ -266,6 +266,7 @@ for i, message in enumerate(st.session_state.messages):
                         "tool_decision": "🤔",
                         "tool_execution": "🔧",
                         "model_call": "🧠",
+                        "cache_hit": "♻️",
                     }.get(step["step_type"], "📝")
 
                     # Create collapsible section for each step
@@ -297,6 +298,7 @@ if config_complete:
             try:
                 # Initialize variables
                 final_answer = ""
+                streamed_text = ""
                 steps = []
                 step_count = 0
 
@@ -308,6 +310,16 @@ if config_complete:
                     neo4j_username=st.session_state.neo4j_username,
                     neo4j_password=st.session_state.neo4j_password,
                 ):
+                    if step_data["step_type"] == "delta":
+                        # Show the answer token by token as it is generated
+                        streamed_text += step_data["content"]
+                        message_placeholder.markdown(streamed_text + "▌")
+                        continue
+                    if step_data["step_type"] == "tool_decision":
+                        # Text streamed before a tool call is not the answer
+                        streamed_text = ""
+                        message_placeholder.empty()
+
                     steps.append(step_data)
 
                     if step_data["is_final"]:
@@ -322,6 +334,7 @@ if config_complete:
                                 "tool_decision": "🤔",
                                 "tool_execution": "🔧",
                                 "model_call": "🧠",
+                                "cache_hit": "♻️",
                             }.get(step_data["step_type"], "📝")
                             with st.expander(
                                 f"{step_type_emoji} Step: {step_data['step_type'].replace('_', ' ').title()}",
@@ -0,0 +1,100 @@
+"""Recall@k and latency of the IVF index against exact search.
+
+Runs on an existing PDF index directory (``--index-dir``) or, by default, on a
+synthetic clustered corpus. Queries are perturbed copies of indexed chunk
+vectors, and both searches run over the same memory-mapped matrix.
+
+    python benchmarks/ann_recall.py --rows 50000 --nprobe 1 2 4 8 16 32
+    python benchmarks/ann_recall.py --index-dir tools/pdf_data/.cache/index-...
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.ann_index import IVFIndex
+from tools.vector_index import VectorIndex
+
+
+def synthetic_index(
+    directory: str, rows: int, dim: int, clusters: int, seed: int
+) -> VectorIndex:
+    """Build a VectorIndex of clustered random vectors in ``directory``."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((rows, dim)).astype(
+        np.float32
+    )
+    docs = [Document(page_content=f"chunk {i}", metadata={}) for i in range(rows)]
+    index_dir = os.path.join(directory, "index")
+    VectorIndex.build(index_dir, docs, vectors, model="synthetic", ann_min_rows=0)
+    return VectorIndex.load(index_dir)
+
+
+def benchmark(index: VectorIndex, k: int, nprobes, n_queries: int, seed: int):
+    rng = np.random.default_rng(seed)
+    n_rows, dim = index.vectors.shape
+    query_rows = rng.choice(n_rows, min(n_queries, n_rows), replace=False)
+    queries = np.asarray(index.vectors[query_rows], dtype=np.float32)
+    queries += 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    start = time.perf_counter()
+    exact = [set(index.search(q, k, exact=True)[0].tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"rows={n_rows} dim={dim} lists={index.ivf.n_lists} k={k}")
+    print(f"{'search':>12} {'recall@k':>10} {'ms/query':>10} {'scanned':>10}")
+    print(f"{'exact':>12} {1.0:>10.4f} {exact_ms:>10.3f} {n_rows:>10}")
+
+    for nprobe in nprobes:
+        hits = 0
+        scanned = 0
+        start = time.perf_counter()
+        for query, truth in zip(queries, exact):
+            found, _ = index.ivf.search(index.vectors, query, k, nprobe)
+            hits += len(truth.intersection(found.tolist()))
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        for query in queries:
+            scanned += len(index.ivf.candidates(query, nprobe))
+        recall = hits / sum(len(t) for t in exact)
+        print(
+            f"{'nprobe=' + str(nprobe):>12} {recall:>10.4f} {elapsed_ms:>10.3f} "
+            f"{scanned // len(queries):>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index-dir", help="Existing PDF index to benchmark")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--lists", type=int, default=0, help="0 = automatic")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.index_dir:
+            index = VectorIndex.load(args.index_dir)
+        else:
+            index = synthetic_index(
+                tmp, args.rows, args.dim, args.clusters, args.seed
+            )
+        if index.ivf is None or args.lists:
+            index.ivf = IVFIndex.train(index.vectors, n_lists=args.lists or None)
+        benchmark(index, args.k, args.nprobe, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
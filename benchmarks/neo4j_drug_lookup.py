@@ -0,0 +1,149 @@
+"""Latency of drug name lookups: label scan vs. full-text index.
+
+Runs against a local Neo4j, for example a throwaway container:
+
+    docker run --rm -p 7687:7687 -e NEO4J_AUTH=neo4j/password neo4j:5
+    NEO4J_URI=bolt://localhost:7687 NEO4J_USERNAME=neo4j NEO4J_PASSWORD=password \\
+        python benchmarks/neo4j_drug_lookup.py --seed 200000 --terms tramadol aspirin
+
+``--seed`` adds synthetic :Drug nodes (tagged ``benchmark: true`` and removed
+again with ``--cleanup``). The index is provisioned with the same
+idempotent routine as ``python -m tools.neo4j_tool ensure-indexes``.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neo4j import GraphDatabase
+
+from tools.neo4j_tool import (
+    DRUG_FULLTEXT_INDEX,
+    Neo4jTool,
+    fulltext_query,
+)
+
+SUBSTANCES = [
+    "tramadol",
+    "aspirin",
+    "ibuprofen",
+    "paracetamol",
+    "tapentadol",
+    "morphine",
+    "oxycodone",
+    "naproxen",
+    "diclofenac",
+    "codeine",
+]
+FORMS = ["tablets", "capsules", "oral solution", "injection", "retard"]
+
+STRATEGIES = {
+    "scan": (
+        "MATCH (d:Drug) WHERE toLower(d.name) CONTAINS toLower($drug_name) "
+        "RETURN d.name AS name LIMIT 20"
+    ),
+    "fulltext": (
+        f"CALL db.index.fulltext.queryNodes('{DRUG_FULLTEXT_INDEX}', $fulltext_query) "
+        "YIELD node, score RETURN node.name AS name ORDER BY score DESC LIMIT 20"
+    ),
+}
+
+
+def seed(driver, count: int, batch_size: int = 10000) -> None:
+    """Create ``count`` synthetic Drug nodes."""
+    for start in range(0, count, batch_size):
+        rows = [
+            {
+                "name": f"{SUBSTANCES[i % len(SUBSTANCES)].title()} "
+                f"{(i * 7) % 500 + 5}mg {FORMS[i % len(FORMS)]} #{i}"
+            }
+            for i in range(start, min(count, start + batch_size))
+        ]
+        driver.execute_query(
+            "UNWIND $rows AS row CREATE (:Drug {name: row.name, benchmark: true})",
+            rows=rows,
+        )
+    print(f"🌱 Seeded {count} Drug nodes")
+
+
+def cleanup(driver) -> None:
+    with driver.session() as session:
+        session.run(
+            "MATCH (d:Drug {benchmark: true}) "
+            "CALL { WITH d DETACH DELETE d } IN TRANSACTIONS OF 10000 ROWS"
+        ).consume()
+    print("🧹 Removed benchmark Drug nodes")
+
+
+def db_hits(plan) -> int:
+    """Total database hits of a PROFILE plan tree."""
+    if not plan:
+        return 0
+    return plan.get("dbHits", 0) + sum(
+        db_hits(child) for child in plan.get("children", [])
+    )
+
+
+def benchmark(driver, terms, repeats: int) -> None:
+    print(
+        f"{'strategy':>12} {'term':>12} {'rows':>6} "
+        f"{'median ms':>10} {'p95 ms':>8} {'db hits':>10}"
+    )
+    for name, query in STRATEGIES.items():
+        for term in terms:
+            params = {"drug_name": term, "fulltext_query": fulltext_query(term)}
+            records, summary, _ = driver.execute_query("PROFILE " + query, **params)
+            hits = db_hits(summary.profile)
+
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                driver.execute_query(query, **params)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(0.95 * len(timings)))]
+            print(
+                f"{name:>12} {term:>12} {len(records):>6} "
+                f"{statistics.median(timings):>10.2f} {p95:>8.2f} {hits:>10}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Synthetic Drug nodes to add"
+    )
+    parser.add_argument(
+        "--cleanup", action="store_true", help="Remove seeded nodes and exit"
+    )
+    parser.add_argument(
+        "--terms", nargs="+", default=["tramadol", "aspirin", "codeine"]
+    )
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+    auth = (
+        os.getenv("NEO4J_USERNAME", "neo4j"),
+        os.getenv("NEO4J_PASSWORD", "password"),
+    )
+    with GraphDatabase.driver(uri, auth=auth) as driver:
+        if args.cleanup:
+            cleanup(driver)
+            return
+        if args.seed:
+            seed(driver, args.seed)
+
+        tool = Neo4jTool()
+        tool.driver = driver
+        if not tool.ensure_indexes():
+            sys.exit("❌ Could not provision the drug lookup index")
+        benchmark(driver, args.terms, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
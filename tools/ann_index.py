@@ -0,0 +1,158 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+CENTROIDS_FILE = "ivf_centroids.npy"
+OFFSETS_FILE = "ivf_offsets.npy"
+ROW_IDS_FILE = "ivf_row_ids.npy"
+
+# Rows assigned to centroids per block, to bound temporary memory.
+_ASSIGN_BLOCK_ROWS = 65536
+
+
+def default_n_lists(n_rows: int) -> int:
+    """Rule-of-thumb number of inverted lists (about 4 * sqrt(n))."""
+    return max(1, min(n_rows, int(4 * np.sqrt(n_rows))))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for every row of ``vectors``."""
+    assignment = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], _ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + _ASSIGN_BLOCK_ROWS], np.float32)
+        assignment[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index.
+
+    Rows are partitioned into ``n_lists`` cells by spherical k-means over the
+    unit-normalized vectors. A query scores the centroids, scans only the rows
+    of the ``nprobe`` closest cells and ranks those exactly, so ``nprobe`` is
+    the recall/latency knob: ``nprobe == n_lists`` is an exact search.
+
+    The cells are stored CSR-style: ``row_ids`` lists the rows grouped by cell
+    and ``offsets[i]:offsets[i + 1]`` is the slice belonging to cell ``i``.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        row_ids: np.ndarray,
+        nprobe: int = 8,
+    ):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.row_ids = row_ids
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        n_lists: Optional[int] = None,
+        n_iter: int = 20,
+        sample_size: int = 100_000,
+        nprobe: int = 8,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Cluster unit-normalized ``vectors`` and build the inverted lists.
+
+        Centroids are trained on a random sample of at most ``sample_size``
+        rows; every row is then assigned to its closest centroid.
+        """
+        n_rows = vectors.shape[0]
+        if n_rows == 0:
+            raise ValueError("Cannot train an IVF index on an empty matrix")
+        n_lists = min(n_lists or default_n_lists(n_rows), n_rows)
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(
+            rng.choice(n_rows, min(n_rows, max(sample_size, n_lists)), replace=False)
+        )
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignment = _assign(sample, centroids)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=n_lists)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            non_empty = counts > 0
+
+            sums = np.zeros_like(centroids)
+            sums[non_empty] = np.add.reduceat(
+                sample[order], starts[non_empty], axis=0
+            )
+            # Re-seed empty cells with random sample rows
+            n_empty = int((~non_empty).sum())
+            if n_empty:
+                sums[~non_empty] = sample[rng.choice(len(sample), n_empty)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms > 0, norms, 1.0)
+
+        assignment = _assign(vectors, centroids)
+        row_ids = np.argsort(assignment, kind="stable").astype(np.int64)
+        counts = np.bincount(assignment, minlength=n_lists)
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        return cls(centroids.astype(np.float32), offsets, row_ids, nprobe)
+
+    def save(self, index_dir: str) -> None:
+        """Write the centroids and inverted lists into ``index_dir``."""
+        np.save(os.path.join(index_dir, CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(index_dir, OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(index_dir, ROW_IDS_FILE), self.row_ids)
+
+    @classmethod
+    def load(cls, index_dir: str, nprobe: int = 8) -> Optional["IVFIndex"]:
+        """Open the IVF files in ``index_dir``, or return None if there are none."""
+        centroids_path = os.path.join(index_dir, CENTROIDS_FILE)
+        if not os.path.exists(centroids_path):
+            return None
+        return cls(
+            np.load(centroids_path),
+            np.load(os.path.join(index_dir, OFFSETS_FILE)),
+            np.load(os.path.join(index_dir, ROW_IDS_FILE), mmap_mode="r"),
+            nprobe,
+        )
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Rows in the ``nprobe`` cells closest to the unit-normalized ``query``."""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            cells = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            cells = np.arange(self.n_lists)
+        return np.concatenate(
+            [self.row_ids[self.offsets[c] : self.offsets[c + 1]] for c in cells]
+        )
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-``k`` rows of ``vectors`` for a unit-normalized query."""
+        rows = np.sort(self.candidates(query, nprobe))
+        if len(rows) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+        k = min(k, len(rows))
+        if k < len(rows):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        order = top[np.argsort(-scores[top], kind="stable")]
+        return rows[order], scores[order]
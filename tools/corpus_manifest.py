@@ -0,0 +1,172 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from tools.embedding_cache import EmbeddingCache, file_sha256
+from tools.pdf_ingest import PARSER
+from tools.vector_index import META_FILE, VectorIndex
+
+
+class CorpusManifest:
+    """Record of the PDFs in the current vector index.
+
+    For every indexed file the manifest keeps its content hash, size and
+    modification time, its embedding cache key, its page count and the IDs of
+    its chunks. A rebuild uses it to skip hashing untouched files and to reuse
+    the chunks of unchanged documents, so only new or modified PDFs are parsed
+    and embedded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_dir: Optional[str] = None
+        self.files: Dict[str, Dict] = {}
+        self._stats: Dict[str, Tuple[str, int, int]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "CorpusManifest":
+        """Read a manifest from ``path``; a missing file gives an empty one."""
+        manifest = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            manifest.index_dir = data.get("index_dir")
+            manifest.files = data.get("files", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable corpus manifest {path}: {e}")
+        return manifest
+
+    def save(self) -> None:
+        """Atomically write the manifest to disk."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"index_dir": self.index_dir, "files": self.files}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def document_keys(
+        self, pdf_paths: List[str], model: str, chunk_size: int, chunk_overlap: int
+    ) -> List[str]:
+        """Return the embedding cache key of every PDF in ``pdf_paths``.
+
+        Files whose size and modification time match the manifest reuse the
+        recorded hash instead of being read again.
+        """
+        keys = []
+        for path in pdf_paths:
+            abs_path = os.path.abspath(path)
+            stat = os.stat(abs_path)
+            entry = self.files.get(abs_path)
+            if (
+                entry
+                and entry.get("size") == stat.st_size
+                and entry.get("mtime_ns") == stat.st_mtime_ns
+            ):
+                sha256 = entry["sha256"]
+            else:
+                sha256 = file_sha256(abs_path)
+            self._stats[abs_path] = (sha256, stat.st_size, stat.st_mtime_ns)
+            keys.append(
+                EmbeddingCache.make_key(
+                    sha256, chunk_size, chunk_overlap, model, PARSER
+                )
+            )
+        return keys
+
+    def open_index(self) -> Optional[VectorIndex]:
+        """Open the index the manifest was last recorded against, if it exists."""
+        if not self.index_dir or not os.path.exists(
+            os.path.join(self.index_dir, META_FILE)
+        ):
+            return None
+        try:
+            return VectorIndex.load(self.index_dir)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not open previous index {self.index_dir}: {e}")
+            return None
+
+    def reusable_chunks(
+        self,
+        keys: List[str],
+        previous: Optional[VectorIndex],
+        cache: Optional[EmbeddingCache] = None,
+    ) -> Dict[str, Tuple[List[Document], np.ndarray]]:
+        """Return chunks and vectors of unchanged documents.
+
+        The exact float32 vectors come from the embedding ``cache``; they are
+        read back from ``previous`` only when the cache misses, since a
+        float16 index would quantize them again on every rebuild.
+        """
+        if previous is None:
+            return {}
+
+        row_of = {
+            doc.metadata.get("chunk_id"): row for row, doc in enumerate(previous.docs)
+        }
+        wanted = set(keys)
+        reusable = {}
+        for entry in self.files.values():
+            key = entry.get("key")
+            if key not in wanted or key in reusable:
+                continue
+            cached = cache.load(key) if cache is not None else None
+            if cached is not None and len(cached[0]) == len(entry["chunk_ids"]):
+                reusable[key] = cached
+                continue
+            try:
+                rows = np.asarray(
+                    [row_of[chunk_id] for chunk_id in entry["chunk_ids"]],
+                    dtype=np.int64,
+                )
+            except KeyError:
+                continue
+            reusable[key] = (
+                [previous.docs[row] for row in rows],
+                previous.raw_vectors(rows),
+            )
+        return reusable
+
+    def diff(self, pdf_paths: List[str], keys: List[str]) -> Dict[str, List[str]]:
+        """Classify files as added, changed or removed since the last record."""
+        current = {os.path.abspath(p): k for p, k in zip(pdf_paths, keys)}
+        changes: Dict[str, List[str]] = {"added": [], "changed": [], "removed": []}
+        for path, key in current.items():
+            entry = self.files.get(path)
+            if entry is None:
+                changes["added"].append(path)
+            elif entry.get("key") != key:
+                changes["changed"].append(path)
+        changes["removed"] = [p for p in self.files if p not in current]
+        return changes
+
+    def record(
+        self, pdf_paths: List[str], keys: List[str], index: VectorIndex
+    ) -> None:
+        """Replace the file records with the contents of ``index``."""
+        chunk_ids: Dict[str, List[str]] = {}
+        page_counts: Dict[str, int] = {}
+        for doc in index.docs:
+            chunk_id = doc.metadata.get("chunk_id", "")
+            prefix = chunk_id.rsplit("-", 1)[0]
+            chunk_ids.setdefault(prefix, []).append(chunk_id)
+            page_counts.setdefault(prefix, doc.metadata.get("total_pages", 0))
+
+        files = {}
+        for path, key in zip(pdf_paths, keys):
+            abs_path = os.path.abspath(path)
+            sha256, size, mtime_ns = self._stats[abs_path]
+            files[abs_path] = {
+                "sha256": sha256,
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "key": key,
+                "page_count": page_counts.get(key[:16], 0),
+                "chunk_ids": chunk_ids.get(key[:16], []),
+            }
+        self.files = files
+        self.index_dir = index.index_dir
@@ -0,0 +1,128 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tools.query_cache import normalize_question
+
+_STRING_LITERAL = re.compile(r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"")
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def cypher_literals(cypher: str) -> List[str]:
+    """String literals used in a Cypher query."""
+    return [single or double for single, double in _STRING_LITERAL.findall(cypher)]
+
+
+class CypherCache:
+    """Validated Cypher generated for past graph questions.
+
+    Questions are looked up by their normalized text first, then by
+    embedding similarity (at least ``threshold``) when ``embeddings`` is
+    given. A near match is only reused if every string literal of its Cypher
+    (drug, manufacturer names...) also appears in the new question and both
+    questions mention the same numbers, so "drugs by Pfizer" never reuses the
+    query for "drugs by Bayer". Least recently used entries are evicted
+    beyond ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        threshold: float = 0.95,
+        max_entries: int = 256,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        if self.embeddings is None:
+            return None
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self, question: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """Return the entry (with its ``cypher``) for ``question`` or None.
+
+        The question's embedding, if one was computed, is returned as well so
+        that ``store`` does not embed again.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry, None
+            candidates = [e for e in self._entries.values() if e["vector"] is not None]
+
+        vector = self._embed(question)
+        if candidates:
+            similarities = np.stack([e["vector"] for e in candidates]) @ vector
+            text = question.lower()
+            numbers = frozenset(_NUMBER_PATTERN.findall(question))
+            for row in np.argsort(-similarities):
+                if similarities[row] < self.threshold:
+                    break
+                entry = candidates[row]
+                if entry["numbers"] == numbers and all(
+                    literal.lower() in text for literal in entry["literals"]
+                ):
+                    with self._lock:
+                        if entry["key"] in self._entries:
+                            self._entries.move_to_end(entry["key"])
+                        self.near_hits += 1
+                    return entry, vector
+
+        with self._lock:
+            self.misses += 1
+        return None, vector
+
+    def store(
+        self, question: str, cypher: str, vector: Optional[np.ndarray] = None
+    ) -> None:
+        """Remember ``cypher`` as the validated query for ``question``."""
+        key = normalize_question(question)
+        entry = {
+            "key": key,
+            "question": question,
+            "cypher": cypher,
+            "literals": cypher_literals(cypher),
+            "numbers": frozenset(_NUMBER_PATTERN.findall(question)),
+            "vector": vector if vector is not None else self._embed(question),
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, entry: Dict[str, Any]) -> None:
+        """Drop an entry whose Cypher no longer runs."""
+        with self._lock:
+            self._entries.pop(entry["key"], None)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and the hit rate since startup."""
+        with self._lock:
+            hits = self.exact_hits + self.near_hits
+            lookups = hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
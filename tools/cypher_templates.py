@@ -0,0 +1,221 @@
+"""Parameterized Cypher for the graph questions we see most often.
+
+Each template pairs question patterns with a pre-written query. A question
+that matches a pattern is answered by running the query with the extracted
+entity, without any LLM call. ``{drug_match}`` in a query is replaced by the
+index-backed clause that binds ``d`` and ``score`` for ``$drug_name``.
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+THERAPEUTIC_CATEGORIES_CYPHER = """
+{drug_match}
+WITH d, score
+ORDER BY score DESC
+LIMIT $limit
+CALL {
+    WITH d
+    OPTIONAL MATCH (d)-[r]-(related)
+    WHERE related:Category OR related:TherapeuticCategory OR related:Type
+    RETURN collect(DISTINCT {
+        relationship_type: type(r), category_name: related.name
+    }) AS related_categories
+}
+RETURN d.name AS drug_name,
+       d.category AS category,
+       d.type AS type,
+       [prop IN keys(d) WHERE prop CONTAINS 'category'
+            OR prop CONTAINS 'therapeutic'
+            OR prop CONTAINS 'type' | prop] AS relevant_properties,
+       [c IN related_categories WHERE c.category_name IS NOT NULL]
+            AS related_categories,
+       score
+ORDER BY score DESC
+"""
+
+MANUFACTURERS_OF_DRUG_CYPHER = """
+{drug_match}
+WITH d, score
+ORDER BY score DESC
+LIMIT $limit
+MATCH (d)--(m:Manufacturer)
+RETURN d.name AS drug_name, collect(DISTINCT m.name) AS manufacturers,
+       max(score) AS score
+ORDER BY score DESC
+"""
+
+DRUGS_BY_MANUFACTURER_CYPHER = """
+MATCH (m:Manufacturer)
+WHERE toLower(m.name) CONTAINS toLower($manufacturer)
+MATCH (m)--(d:Drug)
+RETURN m.name AS manufacturer, collect(DISTINCT d.name)[..$limit] AS drugs
+"""
+
+
+def merge_category_rows(rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge therapeutic category rows of drugs sharing a name, keeping order."""
+    drugs: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        drug = drugs.setdefault(
+            row["drug_name"],
+            {
+                "drug_name": row["drug_name"],
+                "categories": [],
+                "types": [],
+                "relevant_properties": [],
+                "related_categories": [],
+                "score": row["score"],
+            },
+        )
+        for field, value in (("categories", row["category"]), ("types", row["type"])):
+            if value is not None and value not in drug[field]:
+                drug[field].append(value)
+        for field in ("relevant_properties", "related_categories"):
+            for value in row[field]:
+                if value not in drug[field]:
+                    drug[field].append(value)
+    return list(drugs.values())
+
+
+def manufacturers_of_drug_local(adjacency, drug: str, limit: int) -> List[Dict]:
+    """``MANUFACTURERS_OF_DRUG_CYPHER`` rows from an adjacency snapshot."""
+    return [
+        {"drug_name": name, "manufacturers": manufacturers, "score": 1.0}
+        for name, manufacturers in adjacency.one_hop(
+            drug, "Drug", "Manufacturer", limit
+        )
+    ]
+
+
+def drugs_by_manufacturer_local(adjacency, manufacturer: str, limit: int) -> List[Dict]:
+    """``DRUGS_BY_MANUFACTURER_CYPHER`` rows from an adjacency snapshot."""
+    return [
+        {"manufacturer": name, "drugs": drugs}
+        for name, drugs in adjacency.one_hop(
+            manufacturer, "Manufacturer", "Drug", limit
+        )
+    ]
+
+
+class CypherTemplate:
+    """A question shape answered by one parameterized Cypher query.
+
+    ``patterns`` are regexes whose named group ``entity`` captures the drug or
+    manufacturer, which is passed to the query as ``$<parameter>``.
+    ``required_labels`` must exist in the graph for the template to apply.
+    ``local``, if given, computes the same rows from a ``GraphAdjacency``
+    snapshot without querying Neo4j.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        patterns: Sequence[str],
+        cypher: str,
+        parameter: str,
+        required_labels: Sequence[str] = (),
+        postprocess: Callable[[List[Dict[str, Any]]], Any] = list,
+        local: Optional[Callable[[Any, str, int], List[Dict[str, Any]]]] = None,
+    ):
+        self.name = name
+        self.patterns = [re.compile(p, re.IGNORECASE) for p in patterns]
+        self.cypher = cypher
+        self.parameter = parameter
+        self.required_labels = set(required_labels)
+        self.postprocess = postprocess
+        self.local = local
+
+    def match(self, question: str) -> Optional[str]:
+        """The entity named in ``question`` if it has this template's shape.
+
+        Entities containing a connective ("tramadol and their categories",
+        "that treat pain") mean the question asks for more than the template
+        answers, so it is left to the QA chain.
+        """
+        text = question.strip().rstrip("?.!").strip()
+        for pattern in self.patterns:
+            found = pattern.search(text)
+            if found:
+                entity = clean_entity(found.group("entity"))
+                if entity and not _CONNECTIVES.search(entity):
+                    return entity
+        return None
+
+
+def clean_entity(text: str) -> str:
+    """Strip quotes, articles and trailing punctuation around an entity."""
+    text = text.strip().strip("?.!").strip().strip("'\"`").strip()
+    return re.sub(r"^(?:the|a|an)\s+", "", text, flags=re.IGNORECASE)
+
+
+_DRUG = r"(?:drugs?|medicines?|medications?|products?)"
+_MAKE = r"(?:make|makes|made|manufactures?|manufactured|produces?|produced|markets?)"
+# One name: stops before clause punctuation, anchored to the question's end
+_ENTITY = r"(?P<entity>[^,;:?!]+?)"
+_CONNECTIVES = re.compile(
+    r"\b(?:and|or|that|which|who|whose|with|without|in|their|its|also|plus|"
+    r"versus|vs|compared?|than|where|when|how|not)\b|[&/+]",
+    re.IGNORECASE,
+)
+
+TEMPLATES = [
+    CypherTemplate(
+        "manufacturers_of_drug",
+        [
+            rf"^(?:who|which (?:companies|company|manufacturers?)|what "
+            rf"(?:companies|company|manufacturers?))\s+(?:is\s+|are\s+)?{_MAKE}"
+            rf"\s+(?:the\s+)?(?:{_DRUG}\s+)?{_ENTITY}$",
+            rf"^(?:list |show |get )?(?:the )?manufacturers? (?:of|for) "
+            rf"(?:the\s+)?(?:{_DRUG}\s+)?{_ENTITY}$",
+        ],
+        MANUFACTURERS_OF_DRUG_CYPHER,
+        parameter="drug_name",
+        required_labels=["Drug", "Manufacturer"],
+        local=manufacturers_of_drug_local,
+    ),
+    CypherTemplate(
+        "drugs_by_manufacturer",
+        [
+            rf"^(?:which|what|list|show|get)?\s*(?:all\s+)?{_DRUG}\s+(?:are\s+)?"
+            rf"{_MAKE}\s+by\s+{_ENTITY}$",
+            rf"^(?:which|what) (?:{_DRUG} )?(?:does|do) {_ENTITY} {_MAKE}$",
+        ],
+        DRUGS_BY_MANUFACTURER_CYPHER,
+        parameter="manufacturer",
+        required_labels=["Drug", "Manufacturer"],
+        local=drugs_by_manufacturer_local,
+    ),
+    CypherTemplate(
+        "categories_for_substance",
+        [
+            r"^(?:what|which|list|show|get)?\s*(?:are\s+|is\s+)?(?:the\s+)?"
+            r"(?:therapeutic\s+)?categor(?:y|ies)\s+(?:of|for)\s+"
+            rf"(?:{_DRUG}\s+(?:containing|with)\s+)?{_ENTITY}$",
+            r"^what (?:therapeutic\s+)?categor(?:y|ies) (?:is|are|does|do) "
+            rf"{_ENTITY} (?:in|belong to)$",
+        ],
+        THERAPEUTIC_CATEGORIES_CYPHER,
+        parameter="drug_name",
+        required_labels=["Drug"],
+        postprocess=merge_category_rows,
+    ),
+]
+
+
+def match_template(
+    question: str,
+    labels: Optional[Sequence[str]] = None,
+    templates: Sequence[CypherTemplate] = TEMPLATES,
+) -> Optional[Tuple[CypherTemplate, str]]:
+    """The first template (and its entity) matching ``question``, or None.
+
+    Templates needing labels missing from ``labels`` are skipped.
+    """
+    for template in templates:
+        if labels is not None and not template.required_labels.issubset(labels):
+            continue
+        entity = template.match(question)
+        if entity:
+            return template, entity
+    return None
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "pdf_data", ".cache")
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Return the hex SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk cache of chunk texts and their embeddings.
+
+    Each entry is stored as two files named after the cache key: ``<key>.npy``
+    holds the float32 embedding matrix and ``<key>.json`` the chunk texts and
+    metadata, in the same row order.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or os.getenv("PDF_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+    @staticmethod
+    def make_key(
+        pdf_hash: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        model: str,
+        parser: str,
+    ) -> str:
+        """Build a cache key from the PDF hash, parser, splitter and model."""
+        payload = json.dumps(
+            {
+                "pdf_sha256": pdf_hash,
+                "parser": parser,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "model": model,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return base + ".npy", base + ".json"
+
+    def load(self, key: str) -> Optional[Tuple[List[Document], np.ndarray]]:
+        """Return the cached chunks and vectors for ``key``, or None on a miss."""
+        vectors_path, chunks_path = self._paths(key)
+        if not (os.path.exists(vectors_path) and os.path.exists(chunks_path)):
+            return None
+
+        try:
+            vectors = np.load(vectors_path)
+            with open(chunks_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable embedding cache entry {key}: {e}")
+            return None
+
+        if len(records) != vectors.shape[0]:
+            print(f"⚠️ Ignoring inconsistent embedding cache entry {key}")
+            return None
+
+        docs = [
+            Document(page_content=r["page_content"], metadata=r["metadata"])
+            for r in records
+        ]
+        return docs, vectors
+
+    def save(self, key: str, docs: List[Document], vectors) -> None:
+        """Store chunks and their vectors under ``key``.
+
+        Files are written to a temporary name first and then renamed, so other
+        worker processes never observe a partially written entry.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        vectors_path, chunks_path = self._paths(key)
+        records = [
+            {"page_content": doc.page_content, "metadata": doc.metadata}
+            for doc in docs
+        ]
+
+        tmp_suffix = f".{os.getpid()}.tmp"
+        with open(vectors_path + tmp_suffix, "wb") as f:
+            np.save(f, np.asarray(vectors, dtype=np.float32))
+        with open(chunks_path + tmp_suffix, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+
+        os.replace(chunks_path + tmp_suffix, chunks_path)
+        os.replace(vectors_path + tmp_suffix, vectors_path)
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from tools.query_cache import PersistentLRUCache
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(__file__), "fda_data", ".cache", "fda_cache.sqlite"
+)
+# openFDA refreshes the drug/event dataset quarterly, so a day-old answer is
+# effectively current; stale entries are still served for a week while they
+# are refreshed in the background.
+FDA_CACHE_TTL = float(os.getenv("FDA_CACHE_TTL", "86400"))
+FDA_CACHE_STALE_TTL = float(os.getenv("FDA_CACHE_STALE_TTL", str(7 * 86400)))
+FDA_CACHE_SIZE = int(os.getenv("FDA_CACHE_SIZE", "512"))
+
+
+def cache_key(drug_name: str, limit: int, **filters) -> str:
+    """Cache key for a (drug, limit, filters) lookup."""
+    return json.dumps(
+        [drug_name.strip().upper(), limit, filters], sort_keys=True, default=str
+    )
+
+
+class FDAResponseCache:
+    """Two-tier TTL cache of parsed openFDA responses.
+
+    Entries live in an in-process LRU backed by a SQLite file. Fresh entries
+    are served directly. Stale entries (past ``ttl`` but within
+    ``stale_ttl``) are served immediately while a background thread fetches
+    a replacement, so hot drugs never wait on the upstream API.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = FDA_CACHE_TTL,
+        stale_ttl: float = FDA_CACHE_STALE_TTL,
+        max_entries: int = FDA_CACHE_SIZE,
+    ):
+        self.cache = PersistentLRUCache(
+            path or os.getenv("FDA_CACHE_PATH", DEFAULT_CACHE_PATH),
+            # Bump the suffix when the shape or meaning of cached values changes
+            namespace="fda_adverse_events_v2",
+            max_entries=max_entries,
+            ttl=ttl,
+            stale_ttl=stale_ttl,
+            encode=json.dumps,
+            decode=json.loads,
+        )
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """Return ``(value, is_fresh)`` for ``key``, or None on a miss."""
+        return self.cache.lookup(key)
+
+    def set(self, key: str, value: Any) -> None:
+        self.cache.set(key, value)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, calling ``fetch`` on a miss.
+
+        A stale hit is returned as is and refreshed in the background.
+        """
+        entry = self.cache.lookup(key)
+        if entry is None:
+            value = fetch()
+            self.cache.set(key, value)
+            return value
+
+        value, is_fresh = entry
+        if not is_fresh:
+            self.refresh_in_background(key, fetch)
+        return value
+
+    def refresh_in_background(self, key: str, fetch: Callable[[], Any]) -> None:
+        """Re-fetch ``key`` on a daemon thread, at most once at a time."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.cache.set(key, fetch())
+            except Exception as e:
+                print(f"⚠️ Background FDA cache refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
+
+
+_response_cache: Optional[FDAResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> FDAResponseCache:
+    """Return the module-level FDA response cache, creating it on first use."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = FDAResponseCache()
+    return _response_cache
@@ -0,0 +1,633 @@
+"""Local columnar store of openFDA drug/event reports.
+
+openFDA publishes the drug/event dataset as zipped JSON partitions listed in
+https://api.fda.gov/download.json. ``ingest`` streams those files through an
+incremental JSON parser, flattens the fields ``get_adverse_events`` uses and
+writes one directory of NumPy columns per source file:
+
+- ``receivedate.npy`` (int32, YYYYMMDD) and ``safetyreportid.npy``
+- ``serious.npy`` (int8, 1 serious / 2 not serious / 0 unknown) and
+  ``seriousness.npy`` (uint8 bitmask of ``SERIOUSNESS_CRITERIA``)
+- ``reaction_offsets.npy`` / ``reaction_terms.npy`` / ``reaction_outcomes.npy``:
+  reactions per report, CSR-style, with term IDs into ``reaction_vocab.json``
+- ``drug_offsets.npy`` / ``drug_names.npy``: medicinal products per report,
+  with IDs into ``drug_vocab.json`` and the openFDA generic/brand names
+  reported for each name in ``drug_synonyms.json``
+
+A global inverted index from drug-name tokens to (partition, row) postings,
+sorted newest first, lives in ``_index/`` and is rebuilt after each ingest.
+
+    python -m tools.fda_store ingest --download
+    python -m tools.fda_store ingest path/to/drug-event-0001-of-0001.json.zip
+"""
+
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO
+
+import numpy as np
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(__file__), "fda_data", "store")
+DOWNLOAD_INDEX_URL = "https://api.fda.gov/download.json"
+INDEX_DIR = "_index"
+META_FILE = "meta.json"
+# Bumped whenever partition columns change; older partitions are re-ingested
+FORMAT_VERSION = 3
+# Reports buffered in memory before a partition is flushed to disk
+PARTITION_ROWS = 200_000
+
+# Report-level seriousness flags, in bit order of the ``seriousness`` column
+SERIOUSNESS_CRITERIA = (
+    "seriousnessdeath",
+    "seriousnesslifethreatening",
+    "seriousnesshospitalization",
+    "seriousnessdisabling",
+    "seriousnesscongenitalanomali",
+    "seriousnessother",
+)
+
+_DRUG_TOKEN_PATTERN = re.compile(r"[A-Z0-9]+")
+_WHITESPACE = re.compile(r"\s*")
+
+
+def drug_tokens(name: str) -> List[str]:
+    """Upper-case word tokens of a drug name, as openFDA matches them."""
+    return _DRUG_TOKEN_PATTERN.findall(name.upper())
+
+
+def drug_synonyms(drug: dict) -> List[str]:
+    """Generic, brand and active-substance names openFDA attaches to a drug entry."""
+    openfda = drug.get("openfda") or {}
+    names = list(openfda.get("generic_name") or []) + list(
+        openfda.get("brand_name") or []
+    )
+    substance = (drug.get("activesubstance") or {}).get("activesubstancename")
+    if substance:
+        names.append(substance)
+    return names
+
+
+def matches_drug(names: Iterable[str], query_tokens: Set[str]) -> bool:
+    """Whether any of a drug's names contains every query token."""
+    return any(query_tokens.issubset(drug_tokens(name)) for name in names)
+
+
+class _JSONStream:
+    """Minimal pull parser over a text stream of JSON.
+
+    Values are decoded one at a time with ``json.JSONDecoder.raw_decode``;
+    the buffer only ever holds the unconsumed tail of the stream plus one
+    chunk, so memory stays bounded by the size of a single value.
+    """
+
+    def __init__(self, stream: TextIO, chunk_size: int = 1 << 20):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> None:
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                raise ValueError("Unexpected end of JSON stream")
+            self._fill()
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of buffer")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A number at the very end of the buffer may be cut short
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self, key: str) -> Iterator:
+        """Yield the elements of the top-level object's ``key`` array."""
+        self.expect("{")
+        while self.peek() != "}":
+            name = self.value()
+            self.expect(":")
+            if name == key and self.peek() == "[":
+                self.pos += 1
+                while self.peek() != "]":
+                    yield self.value()
+                    if self.peek() == ",":
+                        self.pos += 1
+                self.pos += 1
+            else:
+                self.value()
+            if self.peek() == ",":
+                self.pos += 1
+
+
+def iter_reports(zip_path: str) -> Iterator[dict]:
+    """Stream the reports of a zipped openFDA drug/event partition."""
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.namelist():
+            if not member.endswith(".json"):
+                continue
+            with archive.open(member) as raw:
+                text = io.TextIOWrapper(raw, encoding="utf-8")
+                yield from _JSONStream(text).iter_array("results")
+
+
+class _PartitionWriter:
+    """Accumulates flattened reports and writes them as NumPy columns."""
+
+    def __init__(self):
+        self.receivedate: List[int] = []
+        self.safetyreportid: List[str] = []
+        self.serious: List[int] = []
+        self.seriousness: List[int] = []
+        self.reaction_offsets = [0]
+        self.reaction_terms: List[int] = []
+        self.reaction_outcomes: List[int] = []
+        self.drug_offsets = [0]
+        self.drug_names: List[int] = []
+        self.reaction_vocab: Dict[str, int] = {}
+        self.drug_vocab: Dict[str, int] = {}
+        self.drug_synonyms: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.receivedate)
+
+    def add(self, report: dict) -> None:
+        date = str(report.get("receivedate", ""))
+        self.receivedate.append(int(date) if date.isdigit() else 0)
+        self.safetyreportid.append(str(report.get("safetyreportid", "N/A")))
+        serious = str(report.get("serious", ""))
+        self.serious.append(int(serious) if serious.isdigit() else 0)
+        self.seriousness.append(
+            sum(
+                1 << bit
+                for bit, field in enumerate(SERIOUSNESS_CRITERIA)
+                if str(report.get(field, "")) == "1"
+            )
+        )
+
+        patient = report.get("patient") or {}
+        for reaction in patient.get("reaction") or []:
+            term = reaction.get("reactionmeddrapt", "N/A")
+            outcome = str(reaction.get("reactionoutcome", ""))
+            self.reaction_terms.append(
+                self.reaction_vocab.setdefault(term, len(self.reaction_vocab))
+            )
+            self.reaction_outcomes.append(int(outcome) if outcome.isdigit() else 0)
+        self.reaction_offsets.append(len(self.reaction_terms))
+
+        for drug in patient.get("drug") or []:
+            name = drug.get("medicinalproduct", "N/A")
+            name_id = self.drug_vocab.setdefault(name, len(self.drug_vocab))
+            self.drug_names.append(name_id)
+            synonyms = drug_synonyms(drug)
+            if synonyms:
+                self.drug_synonyms.setdefault(name_id, set()).update(synonyms)
+        self.drug_offsets.append(len(self.drug_names))
+
+    def write(self, directory: str, source: str) -> None:
+        tmp_dir = f"{directory}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        columns = {
+            "receivedate": np.asarray(self.receivedate, dtype=np.int32),
+            "safetyreportid": np.asarray(self.safetyreportid, dtype=np.str_),
+            "serious": np.asarray(self.serious, dtype=np.int8),
+            "seriousness": np.asarray(self.seriousness, dtype=np.uint8),
+            "reaction_offsets": np.asarray(self.reaction_offsets, dtype=np.int64),
+            "reaction_terms": np.asarray(self.reaction_terms, dtype=np.int32),
+            "reaction_outcomes": np.asarray(self.reaction_outcomes, dtype=np.int8),
+            "drug_offsets": np.asarray(self.drug_offsets, dtype=np.int64),
+            "drug_names": np.asarray(self.drug_names, dtype=np.int32),
+        }
+        for name, column in columns.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), column)
+        for name, vocab in (
+            ("reaction_vocab", self.reaction_vocab),
+            ("drug_vocab", self.drug_vocab),
+        ):
+            with open(os.path.join(tmp_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(sorted(vocab, key=vocab.get), f)
+        with open(
+            os.path.join(tmp_dir, "drug_synonyms.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(
+                [sorted(self.drug_synonyms.get(i, ())) for i in range(len(self.drug_vocab))],
+                f,
+            )
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {"source": source, "rows": len(self), "format_version": FORMAT_VERSION},
+                f,
+            )
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.rename(tmp_dir, directory)
+
+
+def partition_name(source: str) -> str:
+    """Partition directory name for a source URL or path.
+
+    ``.../drug/event/2024q1/drug-event-0001-of-0029.json.zip`` becomes
+    ``2024q1-drug-event-0001-of-0029``.
+    """
+    parts = source.replace("\\", "/").rstrip("/").split("/")
+    stem = parts[-1].split(".")[0]
+    return f"{parts[-2]}-{stem}" if len(parts) > 1 else stem
+
+
+def ingest_zip(
+    zip_path: str,
+    store_dir: str,
+    source: Optional[str] = None,
+    partition_rows: int = PARTITION_ROWS,
+) -> int:
+    """Stream one zipped partition into the store; returns the report count."""
+    base = partition_name(source or zip_path)
+    for name in os.listdir(store_dir):
+        if re.fullmatch(re.escape(base) + r"-p\d+", name):
+            shutil.rmtree(os.path.join(store_dir, name))
+    writer = _PartitionWriter()
+    part = 0
+    total = 0
+    for report in iter_reports(zip_path):
+        writer.add(report)
+        if len(writer) >= partition_rows:
+            writer.write(os.path.join(store_dir, f"{base}-p{part}"), source or zip_path)
+            total += len(writer)
+            writer = _PartitionWriter()
+            part += 1
+    if len(writer) or part == 0:
+        writer.write(os.path.join(store_dir, f"{base}-p{part}"), source or zip_path)
+        total += len(writer)
+    return total
+
+
+def _ingested_sources(store_dir: str) -> set:
+    sources = set()
+    for name in os.listdir(store_dir):
+        meta_path = os.path.join(store_dir, name, META_FILE)
+        if name != INDEX_DIR and os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format_version", 1) == FORMAT_VERSION:
+                sources.add(meta["source"])
+    return sources
+
+
+def download_partition_urls(session=None) -> List[str]:
+    """URLs of all drug/event bulk partitions listed by openFDA."""
+    from tools.fda_tool import FDA_TIMEOUT, get_session
+
+    response = (session or get_session()).get(DOWNLOAD_INDEX_URL, timeout=FDA_TIMEOUT)
+    response.raise_for_status()
+    partitions = response.json()["results"]["drug"]["event"]["partitions"]
+    return [partition["file"] for partition in partitions]
+
+
+def _download(url: str, directory: str, session=None) -> str:
+    """Stream ``url`` to a file in ``directory`` and return its path."""
+    from tools.fda_tool import FDA_TIMEOUT, get_session
+
+    path = os.path.join(directory, url.rsplit("/", 1)[-1])
+    with (session or get_session()).get(url, stream=True, timeout=FDA_TIMEOUT) as r:
+        r.raise_for_status()
+        with open(path, "wb") as f:
+            for block in r.iter_content(chunk_size=1 << 20):
+                f.write(block)
+    return path
+
+
+def ingest(sources: List[str], store_dir: str = DEFAULT_STORE_DIR) -> None:
+    """Ingest local zip files or URLs, skipping already ingested sources.
+
+    The global drug index is rebuilt once at the end.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    done = _ingested_sources(store_dir)
+    for source in sources:
+        if source in done:
+            print(f"⏭️ Already ingested {source}")
+            continue
+        if source.startswith(("http://", "https://")):
+            with tempfile.TemporaryDirectory() as tmp:
+                count = ingest_zip(_download(source, tmp), store_dir, source)
+        else:
+            count = ingest_zip(source, store_dir)
+        print(f"📦 Ingested {count} reports from {source}")
+    build_drug_index(store_dir)
+
+
+def build_drug_index(store_dir: str = DEFAULT_STORE_DIR) -> None:
+    """Rebuild the token -> (partition, row) index over every partition."""
+    partitions = sorted(
+        name
+        for name in os.listdir(store_dir)
+        if name != INDEX_DIR and os.path.exists(os.path.join(store_dir, name, META_FILE))
+    )
+    postings: Dict[str, List[np.ndarray]] = {}
+    posting_dates: Dict[str, List[np.ndarray]] = {}
+    for partition_id, name in enumerate(partitions):
+        directory = os.path.join(store_dir, name)
+        with open(os.path.join(directory, "drug_vocab.json"), "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        with open(
+            os.path.join(directory, "drug_synonyms.json"), "r", encoding="utf-8"
+        ) as f:
+            synonyms = json.load(f)
+        offsets = np.load(os.path.join(directory, "drug_offsets.npy"))
+        names = np.load(os.path.join(directory, "drug_names.npy"))
+        receivedate = np.load(os.path.join(directory, "receivedate.npy"))
+        rows = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+
+        # Group report rows by drug name ID once, then fan out to tokens
+        order = np.argsort(names, kind="stable")
+        bounds = np.searchsorted(names[order], np.arange(len(vocab) + 1))
+        rows_by_token: Dict[str, List[np.ndarray]] = {}
+        for name_id, drug_name in enumerate(vocab):
+            name_rows = rows[order[bounds[name_id] : bounds[name_id + 1]]]
+            name_tokens = set(drug_tokens(drug_name))
+            for synonym in synonyms[name_id]:
+                name_tokens.update(drug_tokens(synonym))
+            for token in name_tokens:
+                rows_by_token.setdefault(token, []).append(name_rows)
+        for token, chunks in rows_by_token.items():
+            token_rows = np.unique(np.concatenate(chunks))
+            postings.setdefault(token, []).append(
+                (np.int64(partition_id) << 32) | token_rows
+            )
+            posting_dates.setdefault(token, []).append(receivedate[token_rows])
+
+    tokens = sorted(postings)
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    all_keys, all_dates = [], []
+    for token_id, token in enumerate(tokens):
+        keys = np.concatenate(postings[token])
+        dates = np.concatenate(posting_dates[token])
+        order = np.argsort(-dates, kind="stable")
+        all_keys.append(keys[order])
+        all_dates.append(dates[order])
+        offsets[token_id + 1] = offsets[token_id] + len(keys)
+
+    index_dir = os.path.join(store_dir, INDEX_DIR)
+    tmp_dir = f"{index_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+    np.save(
+        os.path.join(tmp_dir, "keys.npy"),
+        np.concatenate(all_keys) if all_keys else np.zeros(0, np.int64),
+    )
+    np.save(
+        os.path.join(tmp_dir, "dates.npy"),
+        np.concatenate(all_dates) if all_dates else np.zeros(0, np.int32),
+    )
+    with open(os.path.join(tmp_dir, "tokens.json"), "w", encoding="utf-8") as f:
+        json.dump(tokens, f)
+    with open(os.path.join(tmp_dir, "partitions.json"), "w", encoding="utf-8") as f:
+        json.dump(partitions, f)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.rename(tmp_dir, index_dir)
+    print(f"🗂️ Indexed {len(tokens)} drug tokens over {len(partitions)} partitions")
+
+
+class _Partition:
+    """Lazily memory-mapped columns of one store partition."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._columns: Dict[str, np.ndarray] = {}
+        self._vocabs: Dict[str, List[str]] = {}
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            self._columns[name] = np.load(
+                os.path.join(self.directory, f"{name}.npy"), mmap_mode="r"
+            )
+        return self._columns[name]
+
+    def vocab(self, name: str) -> List[str]:
+        if name not in self._vocabs:
+            with open(
+                os.path.join(self.directory, f"{name}.json"), "r", encoding="utf-8"
+            ) as f:
+                self._vocabs[name] = json.load(f)
+        return self._vocabs[name]
+
+
+class LocalAdverseEventStore:
+    """Read side of the columnar store, answering drug lookups offline."""
+
+    def __init__(self, store_dir: str):
+        index_dir = os.path.join(store_dir, INDEX_DIR)
+        with open(os.path.join(index_dir, "tokens.json"), "r", encoding="utf-8") as f:
+            self.tokens = {token: i for i, token in enumerate(json.load(f))}
+        with open(
+            os.path.join(index_dir, "partitions.json"), "r", encoding="utf-8"
+        ) as f:
+            names = json.load(f)
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"))
+        self.keys = np.load(os.path.join(index_dir, "keys.npy"), mmap_mode="r")
+        self.dates = np.load(os.path.join(index_dir, "dates.npy"), mmap_mode="r")
+        self.partitions = [_Partition(os.path.join(store_dir, n)) for n in names]
+
+    @classmethod
+    def open(cls, store_dir: Optional[str] = None) -> Optional["LocalAdverseEventStore"]:
+        """Open the store, or return None if nothing has been ingested."""
+        store_dir = store_dir or os.getenv("FDA_LOCAL_STORE", DEFAULT_STORE_DIR)
+        if not os.path.exists(os.path.join(store_dir, INDEX_DIR, "tokens.json")):
+            return None
+        return cls(store_dir)
+
+    def matching_keys(self, drug_name: str) -> np.ndarray:
+        """(partition << 32 | row) keys of reports naming the drug, newest first."""
+        postings = []
+        for token in set(drug_tokens(drug_name)):
+            token_id = self.tokens.get(token)
+            if token_id is None:
+                return np.zeros(0, dtype=np.int64)
+            postings.append(
+                self.keys[self.offsets[token_id] : self.offsets[token_id + 1]]
+            )
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+
+        # Intersect in the order of the shortest posting list, keeping dates sorted
+        postings.sort(key=len)
+        keys = np.asarray(postings[0])
+        for other in postings[1:]:
+            keys = keys[np.isin(keys, other)]
+        return keys
+
+    def report(self, key: int, query_tokens: Set[str]) -> dict:
+        """Rebuild one report in the shape returned by ``get_adverse_events``.
+
+        ``drug_names`` lists the report's drugs whose name or synonyms
+        contain every query token.
+        """
+        partition = self.partitions[key >> 32]
+        row = key & 0xFFFFFFFF
+
+        drug_vocab = partition.vocab("drug_vocab")
+        synonyms = partition.vocab("drug_synonyms")
+        d_start, d_end = partition.column("drug_offsets")[row : row + 2]
+        drug_names = [
+            drug_vocab[i]
+            for i in partition.column("drug_names")[d_start:d_end]
+            if matches_drug([drug_vocab[i], *synonyms[i]], query_tokens)
+        ]
+
+        reaction_vocab = partition.vocab("reaction_vocab")
+        r_start, r_end = partition.column("reaction_offsets")[row : row + 2]
+        outcomes = partition.column("reaction_outcomes")[r_start:r_end]
+        return {
+            "receivedate": str(partition.column("receivedate")[row]),
+            "safetyreportid": str(partition.column("safetyreportid")[row]),
+            "drug_names": drug_names,
+            "reactions": [
+                reaction_vocab[i]
+                for i in partition.column("reaction_terms")[r_start:r_end]
+            ],
+            "outcomes": [str(o) if o else "N/A" for o in outcomes],
+        }
+
+    def iter_adverse_events(self, drug_name: str) -> Iterator[dict]:
+        """Lazily yield reports naming ``drug_name``, newest first.
+
+        Reports whose query tokens only match across different drugs are
+        skipped.
+        """
+        query_tokens = set(drug_tokens(drug_name))
+        for key in self.matching_keys(drug_name):
+            report = self.report(int(key), query_tokens)
+            if report["drug_names"]:
+                yield report
+
+    def get_adverse_events(self, drug_name: str, limit: int = 10) -> List[dict]:
+        """The ``limit`` most recent reports naming ``drug_name``."""
+        return list(islice(self.iter_adverse_events(drug_name), limit))
+
+    def count_adverse_events(self, drug_name: str) -> Dict[str, Dict[str, int]]:
+        """Report counts per reaction term, outcome and seriousness for a drug.
+
+        Counts are per report, like openFDA ``count=`` queries: a report that
+        lists the same term or outcome twice is counted once. Outcome and
+        seriousness keys are the raw openFDA codes.
+        """
+        counts: Dict[str, Dict[str, int]] = {
+            field: {} for field in ("reactions", "outcomes", "serious")
+        }
+        counts.update({field: {} for field in SERIOUSNESS_CRITERIA})
+
+        def add(field: str, values: List[str], totals: np.ndarray) -> None:
+            for value, n in zip(values, totals.tolist()):
+                counts[field][value] = counts[field].get(value, 0) + n
+
+        keys = self.matching_keys(drug_name)
+        partition_ids = keys >> 32
+        for partition_id in np.unique(partition_ids):
+            partition = self.partitions[partition_id]
+            rows = np.sort(keys[partition_ids == partition_id] & 0xFFFFFFFF)
+
+            # Expand the CSR ranges of the selected rows into entry indices
+            offsets = partition.column("reaction_offsets")
+            starts, lengths = offsets[rows], np.diff(offsets)[rows]
+            owners = np.repeat(np.arange(len(rows), dtype=np.int64), lengths)
+            entries = np.arange(len(owners)) + np.repeat(
+                starts - (np.cumsum(lengths) - lengths), lengths
+            )
+
+            vocab = partition.vocab("reaction_vocab")
+            width = max(len(vocab), 1)
+            terms = partition.column("reaction_terms")[entries].astype(np.int64)
+            term_ids, n = np.unique(
+                np.unique(owners * width + terms) % width, return_counts=True
+            )
+            add("reactions", [vocab[i] for i in term_ids], n)
+
+            outcomes = partition.column("reaction_outcomes")[entries].astype(np.int64)
+            codes, n = np.unique(np.unique(owners * 8 + outcomes) % 8, return_counts=True)
+            add("outcomes", [str(c) for c in codes[codes > 0]], n[codes > 0])
+
+            codes, n = np.unique(partition.column("serious")[rows], return_counts=True)
+            add("serious", [str(c) for c in codes[codes > 0]], n[codes > 0])
+
+            flags = partition.column("seriousness")[rows]
+            for bit, field in enumerate(SERIOUSNESS_CRITERIA):
+                flagged = np.count_nonzero(flags & (1 << bit))
+                if flagged:
+                    add(field, ["1"], np.array([flagged]))
+        return counts
+
+
+_local_store: Optional[LocalAdverseEventStore] = None
+_local_store_lock = threading.Lock()
+
+
+def get_local_store() -> Optional[LocalAdverseEventStore]:
+    """Return the module-level local store, or None if it has not been built."""
+    global _local_store
+    if _local_store is None:
+        with _local_store_lock:
+            if _local_store is None:
+                _local_store = LocalAdverseEventStore.open()
+    return _local_store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Ingest openFDA drug/event bulk files into the local store."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest")
+    ingest_parser.add_argument(
+        "sources", nargs="*", help="Zipped partitions (paths or URLs) to ingest"
+    )
+    ingest_parser.add_argument(
+        "--download",
+        action="store_true",
+        help="Ingest every partition listed in openFDA's download.json",
+    )
+    ingest_parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR)
+    args = parser.parse_args()
+
+    sources = list(args.sources)
+    if args.download:
+        sources.extend(download_partition_urls())
+    ingest(sources, args.store_dir)
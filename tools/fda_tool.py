@@ -1,39 +1,542 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, Union
+
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tools.fda_cache import cache_key, get_response_cache
+from tools.fda_store import (
+    SERIOUSNESS_CRITERIA,
+    LocalAdverseEventStore,
+    drug_synonyms,
+    drug_tokens,
+    get_local_store,
+    matches_drug,
+)
+
+# Base URL of the openFDA API; point it at a local stub server for testing.
+FDA_API_URL = os.getenv("FDA_API_URL", "https://api.fda.gov")
+# (connect, read) timeouts in seconds
+FDA_TIMEOUT = (
+    float(os.getenv("FDA_CONNECT_TIMEOUT", "3.05")),
+    float(os.getenv("FDA_READ_TIMEOUT", "15")),
+)
+FDA_MAX_RETRIES = int(os.getenv("FDA_MAX_RETRIES", "3"))
+FDA_POOL_SIZE = int(os.getenv("FDA_POOL_SIZE", "10"))
+# openFDA allows 240 requests per minute per client; stay below it by default.
+FDA_RATE_PER_SECOND = float(os.getenv("FDA_RATE_PER_SECOND", "3.5"))
+FDA_RATE_BURST = int(os.getenv("FDA_RATE_BURST", "4"))
+FDA_MAX_CONCURRENCY = int(os.getenv("FDA_MAX_CONCURRENCY", "4"))
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# openFDA caps limit at 1000 per page and skip at 25000; deeper pages are
+# reached through the search_after links it returns in the Link header.
+FDA_MAX_PAGE_SIZE = 1000
+FDA_MAX_SKIP = 25000
+# A drug matches on its reported product name or on the generic/brand names
+# openFDA harmonized onto it
+_DRUG_SEARCH_FIELDS = (
+    "patient.drug.medicinalproduct",
+    "patient.drug.openfda.generic_name",
+    "patient.drug.openfda.brand_name",
+)
+# "api", "local" (the store built by tools.fda_store) or "auto", which uses
+# the local store whenever one has been ingested.
+FDA_BACKEND = os.getenv("FDA_BACKEND", "auto")
+_BACKENDS = ("auto", "api", "local")
+
+# openFDA fields aggregated by count= queries for adverse event summaries
+COUNT_FIELDS = {
+    "reactions": "patient.reaction.reactionmeddrapt.exact",
+    "outcomes": "patient.reaction.reactionoutcome",
+    "serious": "serious",
+    **{field: field for field in SERIOUSNESS_CRITERIA},
+}
+OUTCOME_LABELS = {
+    "1": "Recovered/resolved",
+    "2": "Recovering/resolving",
+    "3": "Not recovered/not resolved",
+    "4": "Recovered/resolved with sequelae",
+    "5": "Fatal",
+    "6": "Unknown",
+}
+SERIOUSNESS_LABELS = {
+    "seriousnessdeath": "Death",
+    "seriousnesslifethreatening": "Life-threatening",
+    "seriousnesshospitalization": "Hospitalization",
+    "seriousnessdisabling": "Disabling",
+    "seriousnesscongenitalanomali": "Congenital anomaly",
+    "seriousnessother": "Other serious",
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def create_session(
+    max_retries: int = FDA_MAX_RETRIES, pool_size: int = FDA_POOL_SIZE
+) -> requests.Session:
+    """Create a keep-alive session that retries 429/5xx with backoff.
+
+    Read timeouts are not retried, so one request never waits much longer
+    than ``FDA_TIMEOUT`` (and the agent's tool timeout) for a stalled server.
+    """
+    retry = Retry(
+        total=max_retries,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=_RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the module-level pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+class RateLimiter:
+    """Process-wide client-side rate limiter for openFDA requests.
+
+    Hands out request slots at ``rate`` per second on average, letting up to
+    ``burst`` requests through back to back. Slots are tracked with a thread
+    lock rather than an asyncio primitive, so the limit holds across threads
+    and across separate event loops.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.burst = max(burst, 1)
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserve the next slot and return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            earliest = now - (self.burst - 1) * self.interval
+            slot = max(earliest, self._next_slot)
+            self._next_slot = slot + self.interval
+            return max(0.0, slot - now)
+
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
 
 
-def get_adverse_events(drug_name: str, limit: int = 10):
-    url = (
-        f"https://api.fda.gov/drug/event.json?"
-        f"search=patient.drug.medicinalproduct:{drug_name}&limit={limit}&sort=receivedate:desc"
+rate_limiter = RateLimiter(FDA_RATE_PER_SECOND, FDA_RATE_BURST)
+
+
+def _local_store(backend: Optional[str]) -> Optional[LocalAdverseEventStore]:
+    """The local store to answer from, or None to query the API."""
+    backend = backend or FDA_BACKEND
+    if backend not in _BACKENDS:
+        raise ValueError(f"backend must be one of {_BACKENDS}, got {backend!r}")
+    if backend == "api":
+        return None
+    store = get_local_store()
+    if store is None and backend == "local":
+        raise RuntimeError(
+            "No local openFDA store found; build one with "
+            "`python -m tools.fda_store ingest --download`"
+        )
+    return store
+
+
+def _drug_search(drug_name: str) -> str:
+    """openFDA search expression matching a drug by product, generic or brand name."""
+    term = drug_name.strip()
+    if " " in term:
+        term = f'"{term}"'
+    # Space-separated clauses are ORed; requests encodes the spaces as "+"
+    return " ".join(f"{field}:{term}" for field in _DRUG_SEARCH_FIELDS)
+
+
+def _search_params(drug_name: str, limit: int) -> Dict[str, Union[str, int]]:
+    return {
+        "search": _drug_search(drug_name),
+        "limit": limit,
+        "sort": "receivedate:desc",
+    }
+
+
+def iter_adverse_events(
+    drug_name: str,
+    page_size: int = 100,
+    max_records: Optional[int] = None,
+    session: Optional[requests.Session] = None,
+    base_url: Optional[str] = None,
+    backend: Optional[str] = None,
+) -> Iterator[dict]:
+    """Lazily yield normalized adverse event reports for a drug, newest first.
+
+    Pages of ``page_size`` reports are requested only as the caller consumes
+    them, so memory stays bounded by one page. Pages are walked with ``skip``
+    and, where openFDA provides one, the ``search_after`` next link, which
+    also reaches past the skip ceiling. Stops after ``max_records`` reports.
+    """
+    store = _local_store(backend)
+    if store is not None:
+        yield from islice(store.iter_adverse_events(drug_name), max_records)
+        return
+
+    session = session or get_session()
+    query_tokens = set(drug_tokens(drug_name))
+    page_size = min(page_size, FDA_MAX_PAGE_SIZE)
+    url = f"{base_url or FDA_API_URL}/drug/event.json"
+    params = _search_params(drug_name, page_size)
+    skip = 0
+    yielded = 0
+    while True:
+        if max_records is not None and params is not None:
+            params["limit"] = min(page_size, max_records - yielded)
+        time.sleep(rate_limiter.reserve())
+        response = session.get(url, params=params, timeout=FDA_TIMEOUT)
+        # openFDA answers 404 when no report matches the search
+        if response.status_code == 404:
+            return
+        response.raise_for_status()
+        payload = response.json()
+        results = payload.get("results", [])
+        for result in results:
+            yield _normalize_report(result, query_tokens)
+            yielded += 1
+            if max_records is not None and yielded >= max_records:
+                return
+
+        next_url = response.links.get("next", {}).get("url")
+        if next_url:
+            # The link carries the search_after cursor and all other params
+            url, params = next_url, None
+            continue
+        skip += len(results)
+        total = payload.get("meta", {}).get("results", {}).get("total", 0)
+        if params is None or not results or skip >= total or skip > FDA_MAX_SKIP:
+            return
+        params["skip"] = skip
+
+
+def get_adverse_events(
+    drug_name: str,
+    limit: int = 10,
+    session: Optional[requests.Session] = None,
+    base_url: Optional[str] = None,
+    use_cache: bool = True,
+    backend: Optional[str] = None,
+):
+    """Get adverse event reports for a drug.
+
+    Answered from the local bulk-data store when ``backend`` (default
+    ``FDA_BACKEND``) selects it, otherwise from the API through the cache.
+    """
+    store = _local_store(backend)
+    if store is not None:
+        return store.get_adverse_events(drug_name, limit)
+    if not use_cache:
+        return _fetch_adverse_events(drug_name, limit, session, base_url)
+    return get_response_cache().get_or_fetch(
+        cache_key(drug_name, limit, base_url=base_url or FDA_API_URL),
+        lambda: _fetch_adverse_events(drug_name, limit, session, base_url),
     )
-    response = requests.get(url)
-    response = response.json()
-
-    useful_data = []
-    for result in response.get("results", []):
-        receivedate = result.get("receivedate", "N/A")
-        safetyreportid = result.get("safetyreportid", "N/A")
-        # Get drug name(s)
-        drug_names = []
-        if "patient" in result and "drug" in result["patient"]:
-            for drug in result["patient"]["drug"]:
-                name = drug.get("medicinalproduct", "N/A")
-                if "TRAMADOL" in name.upper():
-                    drug_names.append(name)
-        # Get reactions
-        reactions = []
-        outcomes = []
-        if "patient" in result and "reaction" in result["patient"]:
-            for reaction in result["patient"]["reaction"]:
-                reactions.append(reaction.get("reactionmeddrapt", "N/A"))
-                outcomes.append(reaction.get("reactionoutcome", "N/A"))
-        useful_data.append(
-            {
-                "receivedate": receivedate,
-                "safetyreportid": safetyreportid,
-                "drug_names": drug_names,
-                "reactions": reactions,
-                "outcomes": outcomes,
-            }
+
+
+def _fetch_adverse_events(
+    drug_name: str,
+    limit: int,
+    session: Optional[requests.Session] = None,
+    base_url: Optional[str] = None,
+):
+    return list(
+        iter_adverse_events(
+            drug_name,
+            page_size=FDA_MAX_PAGE_SIZE,
+            max_records=limit,
+            session=session,
+            base_url=base_url,
+            backend="api",
         )
-    return useful_data
+    )
+
+
+async def _fetch_adverse_events_async(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    drug_name: str,
+    limit: int,
+    base_url: str,
+):
+    """Fetch one drug's reports, walking pages like ``iter_adverse_events``.
+
+    Pages hold at most ``FDA_MAX_PAGE_SIZE`` reports, so any ``limit`` works
+    as in the sync path.
+    """
+    url = f"{base_url}/drug/event.json"
+    params = _search_params(drug_name, min(limit, FDA_MAX_PAGE_SIZE))
+    reports: List[dict] = []
+    skip = 0
+    async with semaphore:
+        while len(reports) < limit:
+            if params is not None:
+                params["limit"] = min(FDA_MAX_PAGE_SIZE, limit - len(reports))
+            response = await _get_with_retries_async(client, url, params)
+            # openFDA answers 404 when no report matches the search
+            if response.status_code == 404:
+                break
+            response.raise_for_status()
+            payload = response.json()
+            results = payload.get("results", [])
+            reports.extend(
+                _parse_adverse_events(payload, drug_name)[: limit - len(reports)]
+            )
+
+            next_url = response.links.get("next", {}).get("url")
+            if next_url:
+                # The link carries the search_after cursor and all other params
+                url, params = next_url, None
+                continue
+            skip += len(results)
+            total = payload.get("meta", {}).get("results", {}).get("total", 0)
+            if params is None or not results or skip >= total or skip > FDA_MAX_SKIP:
+                break
+            params["skip"] = skip
+    return reports
+
+
+async def _get_with_retries_async(
+    client: httpx.AsyncClient, url: str, params: Optional[dict]
+) -> httpx.Response:
+    """GET one page, retrying 429/5xx with exponential backoff."""
+    for attempt in range(FDA_MAX_RETRIES + 1):
+        await rate_limiter.acquire()
+        response = await client.get(url, params=params)
+        if response.status_code not in _RETRY_STATUSES or attempt == FDA_MAX_RETRIES:
+            break
+        retry_after = response.headers.get("Retry-After", "")
+        delay = float(retry_after) if retry_after.isdigit() else 0.5 * 2**attempt
+        await asyncio.sleep(delay)
+    return response
+
+
+async def get_adverse_events_async(
+    drug_names: List[str],
+    limit: int = 10,
+    max_concurrency: int = FDA_MAX_CONCURRENCY,
+    client: Optional[httpx.AsyncClient] = None,
+    base_url: Optional[str] = None,
+    use_cache: bool = True,
+    backend: Optional[str] = None,
+) -> Dict[str, Union[list, str]]:
+    """Fetch adverse events for several drugs concurrently.
+
+    Drugs found in the response cache are served from it (stale entries are
+    refreshed in the background). The rest are requested at most
+    ``max_concurrency`` at a time through the shared rate limiter. Returns a
+    dict keyed by drug name; a drug whose request failed maps to an error
+    string instead of a list of reports. With the local backend every drug
+    is answered from the bulk-data store instead.
+    """
+    drug_names = list(dict.fromkeys(drug_names))
+    store = _local_store(backend)
+    if store is not None:
+        return {name: store.get_adverse_events(name, limit) for name in drug_names}
+    base_url = base_url or FDA_API_URL
+
+    cached: Dict[str, list] = {}
+    if use_cache:
+        response_cache = get_response_cache()
+        for name in drug_names:
+            key = cache_key(name, limit, base_url=base_url)
+            entry = response_cache.lookup(key)
+            if entry is None:
+                continue
+            cached[name], is_fresh = entry
+            if not is_fresh:
+                response_cache.refresh_in_background(
+                    key,
+                    lambda name=name: _fetch_adverse_events(
+                        name, limit, base_url=base_url
+                    ),
+                )
+    to_fetch = [name for name in drug_names if name not in cached]
+    if not to_fetch:
+        return {name: cached[name] for name in drug_names}
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    owns_client = client is None
+    if owns_client:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(FDA_TIMEOUT[1], connect=FDA_TIMEOUT[0]),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+    try:
+        results = await asyncio.gather(
+            *[
+                _fetch_adverse_events_async(client, semaphore, name, limit, base_url)
+                for name in to_fetch
+            ],
+            return_exceptions=True,
+        )
+    finally:
+        if owns_client:
+            await client.aclose()
+
+    fetched = {}
+    for name, result in zip(to_fetch, results):
+        if isinstance(result, Exception):
+            fetched[name] = f"Error: {result}"
+        else:
+            fetched[name] = result
+            if use_cache:
+                response_cache.set(cache_key(name, limit, base_url=base_url), result)
+    return {name: cached.get(name, fetched.get(name)) for name in drug_names}
+
+
+def count_adverse_events(
+    drug_name: str,
+    session: Optional[requests.Session] = None,
+    base_url: Optional[str] = None,
+    use_cache: bool = True,
+    backend: Optional[str] = None,
+) -> Dict[str, Dict[str, int]]:
+    """Report counts per reaction term, outcome and seriousness for a drug.
+
+    Covers every matching report rather than a sample: the API backend runs
+    one ``count=`` query per field in ``COUNT_FIELDS``, the local backend
+    aggregates the bulk-data store. Keys of the inner dicts are raw openFDA
+    terms and codes.
+    """
+    store = _local_store(backend)
+    if store is not None:
+        return store.count_adverse_events(drug_name)
+    if not use_cache:
+        return _fetch_counts(drug_name, session, base_url)
+    return get_response_cache().get_or_fetch(
+        cache_key(drug_name, 0, base_url=base_url or FDA_API_URL, mode="count"),
+        lambda: _fetch_counts(drug_name, session, base_url),
+    )
+
+
+def _fetch_counts(
+    drug_name: str,
+    session: Optional[requests.Session] = None,
+    base_url: Optional[str] = None,
+) -> Dict[str, Dict[str, int]]:
+    """Run the count= queries for a drug concurrently on the pooled session."""
+    session = session or get_session()
+
+    def fetch(field: str) -> Dict[str, int]:
+        time.sleep(rate_limiter.reserve())
+        response = session.get(
+            f"{base_url or FDA_API_URL}/drug/event.json",
+            params={
+                "search": _drug_search(drug_name),
+                "count": field,
+                # openFDA's maximum for count queries
+                "limit": 1000,
+            },
+            timeout=FDA_TIMEOUT,
+        )
+        if response.status_code == 404:
+            return {}
+        response.raise_for_status()
+        return {
+            str(row["term"]): row["count"] for row in response.json().get("results", [])
+        }
+
+    with ThreadPoolExecutor(max_workers=FDA_MAX_CONCURRENCY) as executor:
+        results = executor.map(fetch, COUNT_FIELDS.values())
+        return dict(zip(COUNT_FIELDS, results))
+
+
+def format_adverse_event_counts(
+    drug_name: str, counts: Dict[str, Dict[str, int]], top_n: int = 10
+) -> str:
+    """Render ``count_adverse_events`` output as a compact plain-text table."""
+    total = sum(counts.get("serious", {}).values())
+    if not total and not counts.get("reactions"):
+        return f"No FDA adverse event reports found for {drug_name}."
+
+    def pct(n: int) -> str:
+        return f"{100 * n / total:.1f}%" if total else "-"
+
+    lines = [f"{drug_name.upper()}: {total} reports"]
+    reactions = sorted(counts.get("reactions", {}).items(), key=lambda kv: -kv[1])
+    lines.append(f"Top {min(top_n, len(reactions))} reactions (reports, share):")
+    lines += [f"  {term} | {n} | {pct(n)}" for term, n in reactions[:top_n]]
+
+    lines.append("Outcomes (reports with at least one reaction outcome):")
+    for code, label in OUTCOME_LABELS.items():
+        n = counts.get("outcomes", {}).get(code, 0)
+        if n:
+            lines.append(f"  {label} | {n} | {pct(n)}")
+
+    serious = counts.get("serious", {})
+    lines.append("Seriousness:")
+    lines.append(f"  Serious | {serious.get('1', 0)} | {pct(serious.get('1', 0))}")
+    lines.append(f"  Non-serious | {serious.get('2', 0)} | {pct(serious.get('2', 0))}")
+    for field, label in SERIOUSNESS_LABELS.items():
+        n = counts.get(field, {}).get("1", 0)
+        if n:
+            lines.append(f"  {label} | {n} | {pct(n)}")
+    return "\n".join(lines)
+
+
+def _normalize_report(result: dict, query_tokens: Set[str]) -> dict:
+    """Extract the useful fields from one openFDA drug/event report.
+
+    ``drug_names`` keeps the report's drugs whose product name or openFDA
+    generic/brand names contain every token of the requested drug.
+    """
+    patient = result.get("patient") or {}
+    drug_names = [
+        drug.get("medicinalproduct", "N/A")
+        for drug in patient.get("drug") or []
+        if matches_drug(
+            [drug.get("medicinalproduct", ""), *drug_synonyms(drug)], query_tokens
+        )
+    ]
+    reactions = []
+    outcomes = []
+    for reaction in patient.get("reaction") or []:
+        reactions.append(reaction.get("reactionmeddrapt", "N/A"))
+        outcomes.append(reaction.get("reactionoutcome", "N/A"))
+    return {
+        "receivedate": result.get("receivedate", "N/A"),
+        "safetyreportid": result.get("safetyreportid", "N/A"),
+        "drug_names": drug_names,
+        "reactions": reactions,
+        "outcomes": outcomes,
+    }
+
+
+def _parse_adverse_events(response: dict, drug_name: str) -> List[dict]:
+    """Normalize every report of an openFDA drug/event response."""
+    query_tokens = set(drug_tokens(drug_name))
+    return [
+        _normalize_report(result, query_tokens)
+        for result in response.get("results", [])
+    ]
@@ -0,0 +1,276 @@
+"""In-memory adjacency snapshot of the drug, manufacturer and category subgraph.
+
+The nodes and relationships between the labels in ``SUBGRAPH_LABELS`` are
+exported once into compressed sparse row (CSR) arrays: ``offsets[i]`` to
+``offsets[i + 1]`` slices ``neighbors`` (and ``edge_types``) for node ``i``.
+Relationships are stored in both directions. One- and two-hop lookups such
+as "drugs manufactured by PFIZER" are then answered in-process without a
+round-trip to Neo4j. Snapshots are saved as ``.npz`` files next to the
+schema snapshot for fast warm starts.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SUBGRAPH_LABELS = ("Drug", "Manufacturer", "Category", "TherapeuticCategory")
+# Bumped whenever the snapshot layout changes
+ADJACENCY_VERSION = 1
+
+
+class GraphAdjacency:
+    """CSR adjacency of a labelled subgraph, with node lookup by name."""
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        relationship_types: Sequence[str],
+        names: np.ndarray,
+        kinds: np.ndarray,
+        offsets: np.ndarray,
+        neighbors: np.ndarray,
+        edge_types: np.ndarray,
+        fingerprint: Optional[str] = None,
+        created_at: Optional[float] = None,
+    ):
+        self.labels = list(labels)
+        self.relationship_types = list(relationship_types)
+        self.names = names
+        self.kinds = kinds
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.edge_types = edge_types
+        self.fingerprint = fingerprint
+        self.created_at = created_at if created_at is not None else time.time()
+
+        self._names_lower = np.char.lower(names)
+        self._by_name: Dict[Tuple[int, str], List[int]] = {}
+        for node, (kind, name) in enumerate(zip(kinds.tolist(), self._names_lower)):
+            self._by_name.setdefault((kind, str(name)), []).append(node)
+
+    @classmethod
+    def from_edges(
+        cls,
+        labels: Sequence[str],
+        relationship_types: Sequence[str],
+        names: Sequence[str],
+        kinds: Sequence[int],
+        sources: Sequence[int],
+        targets: Sequence[int],
+        types: Sequence[int],
+        **kwargs,
+    ) -> "GraphAdjacency":
+        """Build the CSR arrays from directed edges between node ids."""
+        node_count = len(names)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        types = np.asarray(types, dtype=np.int16)
+
+        # Both directions, so lookups work from either end of a relationship
+        src = np.concatenate([sources, targets])
+        dst = np.concatenate([targets, sources])
+        edge_types = np.concatenate([types, types])
+        order = np.argsort(src, kind="stable")
+        offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=node_count), out=offsets[1:])
+        return cls(
+            labels,
+            relationship_types,
+            np.asarray(names, dtype=str),
+            np.asarray(kinds, dtype=np.int8),
+            offsets,
+            dst[order].astype(np.int32),
+            edge_types[order],
+            **kwargs,
+        )
+
+    @classmethod
+    def export(
+        cls,
+        driver,
+        labels: Iterable[str] = SUBGRAPH_LABELS,
+        database: Optional[str] = None,
+        fetch_size: int = 10000,
+        fingerprint: Optional[str] = None,
+    ) -> "GraphAdjacency":
+        """Export the nodes of ``labels`` and the relationships among them."""
+        labels = list(labels)
+        ids: Dict[str, int] = {}
+        names: List[str] = []
+        kinds: List[int] = []
+        sources: List[int] = []
+        targets: List[int] = []
+        types: List[int] = []
+        type_codes: Dict[str, int] = {}
+
+        with driver.session(database=database, fetch_size=fetch_size) as session:
+            # A node with several of the labels is kept under the first one
+            for kind, label in enumerate(labels):
+                result = session.run(
+                    f"MATCH (n:`{label}`) RETURN elementId(n) AS id, n.name AS name"
+                )
+                for record in result:
+                    if record["id"] not in ids:
+                        ids[record["id"]] = len(names)
+                        names.append(record["name"] or "")
+                        kinds.append(kind)
+
+            for label in labels:
+                result = session.run(
+                    f"MATCH (a:`{label}`)-[r]->(b) "
+                    "WHERE any(l IN labels(b) WHERE l IN $labels) "
+                    "RETURN elementId(a) AS source, elementId(b) AS target, "
+                    "type(r) AS type",
+                    labels=labels,
+                )
+                for record in result:
+                    sources.append(ids[record["source"]])
+                    targets.append(ids[record["target"]])
+                    types.append(type_codes.setdefault(record["type"], len(type_codes)))
+
+        return cls.from_edges(
+            labels,
+            list(type_codes),
+            names,
+            kinds,
+            sources,
+            targets,
+            types,
+            fingerprint=fingerprint,
+        )
+
+    @property
+    def node_count(self) -> int:
+        return len(self.names)
+
+    @property
+    def edge_count(self) -> int:
+        """Relationships in the subgraph (each is stored in both directions)."""
+        return len(self.neighbors) // 2
+
+    def find(self, name: str, label: str) -> List[int]:
+        """Nodes of ``label`` named ``name`` (case-insensitive), else containing it."""
+        if label not in self.labels:
+            return []
+        kind = self.labels.index(label)
+        query = name.strip().lower()
+        exact = self._by_name.get((kind, query))
+        if exact:
+            return list(exact)
+        matches = (self.kinds == kind) & (np.char.find(self._names_lower, query) >= 0)
+        return np.flatnonzero(matches).tolist()
+
+    def neighbors_of(self, node: int, label: Optional[str] = None) -> np.ndarray:
+        """Neighbor ids of ``node``, optionally restricted to one label."""
+        neighbors = self.neighbors[self.offsets[node] : self.offsets[node + 1]]
+        if label is None:
+            return neighbors
+        if label not in self.labels:
+            return neighbors[:0]
+        return neighbors[self.kinds[neighbors] == self.labels.index(label)]
+
+    def one_hop(
+        self, name: str, source_label: str, target_label: str, limit: int = 50
+    ) -> List[Tuple[str, List[str]]]:
+        """``(source name, target names)`` for sources matching ``name``.
+
+        Sources sharing a name are merged; sources without any neighbor of
+        ``target_label`` are left out.
+        """
+        return self._hops(name, source_label, [target_label], limit)
+
+    def two_hop(
+        self,
+        name: str,
+        source_label: str,
+        via_label: str,
+        target_label: str,
+        limit: int = 50,
+    ) -> List[Tuple[str, List[str]]]:
+        """Like ``one_hop``, through a neighbor of ``via_label``.
+
+        For example the categories of the drugs a manufacturer makes, or the
+        other manufacturers of the drugs a manufacturer makes.
+        """
+        return self._hops(name, source_label, [via_label, target_label], limit)
+
+    def _expand(self, frontier: np.ndarray, label: str) -> np.ndarray:
+        """Distinct neighbors of ``label`` of all ``frontier`` nodes."""
+        starts = self.offsets[frontier]
+        lengths = self.offsets[frontier + 1] - starts
+        # Positions starts[i] .. starts[i] + lengths[i] - 1 for every node
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions += np.arange(lengths.sum())
+        neighbors = self.neighbors[positions]
+        if label not in self.labels:
+            return neighbors[:0]
+        return np.unique(neighbors[self.kinds[neighbors] == self.labels.index(label)])
+
+    def _hops(
+        self, name: str, source_label: str, path: Sequence[str], limit: int
+    ) -> List[Tuple[str, List[str]]]:
+        results: Dict[str, List[str]] = {}
+        for source in self.find(name, source_label):
+            frontier = np.array([source], dtype=np.int64)
+            for label in path:
+                frontier = self._expand(frontier, label)
+            frontier = frontier[frontier != source]
+            if not len(frontier):
+                continue
+            targets = results.setdefault(str(self.names[source]), [])
+            seen = set(targets)
+            for target in self.names[frontier[:limit]].tolist():
+                if target not in seen and len(targets) < limit:
+                    seen.add(target)
+                    targets.append(target)
+            if len(results) >= limit:
+                break
+        return list(results.items())
+
+    def save(self, path: str) -> None:
+        """Atomically write the snapshot as an uncompressed ``.npz`` file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {
+            "version": ADJACENCY_VERSION,
+            "labels": self.labels,
+            "relationship_types": self.relationship_types,
+            "fingerprint": self.fingerprint,
+            "created_at": self.created_at,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps(meta)),
+                names=self.names,
+                kinds=self.kinds,
+                offsets=self.offsets,
+                neighbors=self.neighbors,
+                edge_types=self.edge_types,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["GraphAdjacency"]:
+        """Read a snapshot, or None if missing, unreadable or from an older version."""
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("version") != ADJACENCY_VERSION:
+                    return None
+                return cls(
+                    meta["labels"],
+                    meta["relationship_types"],
+                    data["names"],
+                    data["kinds"],
+                    data["offsets"],
+                    data["neighbors"],
+                    data["edge_types"],
+                    fingerprint=meta["fingerprint"],
+                    created_at=meta["created_at"],
+                )
+        except (OSError, ValueError, KeyError):
+            return None
@@ -0,0 +1,75 @@
+"""Versioned, on-disk snapshot of the Neo4j graph schema.
+
+Full schema introspection (``Neo4jGraph.refresh_schema`` and the Drug
+property probe) is slow. Whether it needs to run again is decided by a
+fingerprint of the database's label, relationship-type and property-key
+catalogs, which Neo4j answers from metadata in a single cheap query.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "neo4j_data", ".cache")
+# Bumped whenever the snapshot layout changes
+SNAPSHOT_VERSION = 1
+
+_CATALOG_QUERY = """
+CALL db.labels() YIELD label
+WITH collect(label) AS labels
+CALL db.relationshipTypes() YIELD relationshipType
+WITH labels, collect(relationshipType) AS relationship_types
+CALL db.propertyKeys() YIELD propertyKey
+RETURN labels, relationship_types, collect(propertyKey) AS property_keys
+"""
+
+
+def fetch_catalog(driver, database: Optional[str] = None) -> Dict[str, Any]:
+    """Labels, relationship types and property keys, plus their fingerprint."""
+    records, _, _ = driver.execute_query(_CATALOG_QUERY, database_=database)
+    record = records[0]
+    catalog = {
+        "labels": sorted(record["labels"]),
+        "relationship_types": sorted(record["relationship_types"]),
+        "property_keys": sorted(record["property_keys"]),
+    }
+    catalog["fingerprint"] = hashlib.sha256(
+        json.dumps(catalog, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return catalog
+
+
+def snapshot_path(
+    uri: str,
+    database: Optional[str] = None,
+    kind: str = "schema",
+    extension: str = "json",
+) -> str:
+    """Snapshot file of ``kind`` for one database, under ``NEO4J_SCHEMA_CACHE_DIR``."""
+    cache_dir = os.getenv("NEO4J_SCHEMA_CACHE_DIR", DEFAULT_CACHE_DIR)
+    key = hashlib.sha256(f"{uri}|{database or ''}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{kind}-{key[:16]}.{extension}")
+
+
+def load_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """Read a snapshot, or None if missing, unreadable or from an older version."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def save_snapshot(path: str, snapshot: Dict[str, Any]) -> None:
+    """Atomically write a snapshot."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot = {**snapshot, "version": SNAPSHOT_VERSION, "created_at": time.time()}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, default=str)
+    os.replace(tmp_path, path)
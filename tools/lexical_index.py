@@ -0,0 +1,171 @@
+import json
+import math
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+TERMS_FILE = "lex_terms.json"
+OFFSETS_FILE = "lex_offsets.npy"
+POSTINGS_FILE = "lex_postings.npy"
+FREQS_FILE = "lex_freqs.npy"
+LENGTHS_FILE = "lex_lengths.npy"
+
+# Numbers keep their internal separators ("1,234.5", "2023"), words are runs
+# of letters.
+_TOKEN_PATTERN = re.compile(r"\d+(?:[.,]\d+)*|[^\W\d_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case, accent-folded tokens of ``text``.
+
+    Accents are stripped so that "Grünenthal" and "Grunenthal" match.
+    """
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return _TOKEN_PATTERN.findall(folded)
+
+
+class LexicalIndex:
+    """BM25 inverted index over the chunks of a vector index.
+
+    Postings are stored CSR-style: for term ``t`` (its position in ``terms``),
+    ``postings[offsets[t]:offsets[t + 1]]`` are the rows containing it and
+    ``freqs`` the matching term frequencies. ``lengths`` holds the token count
+    of every row. Scoring needs no embedding call.
+    """
+
+    def __init__(
+        self,
+        terms: Dict[str, int],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        freqs: np.ndarray,
+        lengths: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.freqs = freqs
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    @classmethod
+    def build(cls, texts: List[str]) -> "LexicalIndex":
+        """Tokenize ``texts`` and build the inverted index."""
+        postings_by_term: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = np.zeros(len(texts), dtype=np.int32)
+        for row, text in enumerate(texts):
+            counts: Dict[str, int] = {}
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings_by_term.setdefault(token, []).append((row, count))
+
+        vocabulary = sorted(postings_by_term)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        postings, freqs = [], []
+        for term_id, term in enumerate(vocabulary):
+            entries = postings_by_term[term]
+            offsets[term_id + 1] = offsets[term_id] + len(entries)
+            postings.extend(row for row, _ in entries)
+            freqs.extend(count for _, count in entries)
+
+        return cls(
+            {term: i for i, term in enumerate(vocabulary)},
+            offsets,
+            np.asarray(postings, dtype=np.int32),
+            np.asarray(freqs, dtype=np.float32),
+            lengths,
+        )
+
+    def save(self, index_dir: str) -> None:
+        """Write the inverted index into ``index_dir``."""
+        with open(os.path.join(index_dir, TERMS_FILE), "w", encoding="utf-8") as f:
+            json.dump(sorted(self.terms, key=self.terms.get), f)
+        np.save(os.path.join(index_dir, OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(index_dir, POSTINGS_FILE), self.postings)
+        np.save(os.path.join(index_dir, FREQS_FILE), self.freqs)
+        np.save(os.path.join(index_dir, LENGTHS_FILE), self.lengths)
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["LexicalIndex"]:
+        """Open the inverted index in ``index_dir``, or return None if absent."""
+        terms_path = os.path.join(index_dir, TERMS_FILE)
+        if not os.path.exists(terms_path):
+            return None
+        with open(terms_path, "r", encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        return cls(
+            {term: i for i, term in enumerate(vocabulary)},
+            np.load(os.path.join(index_dir, OFFSETS_FILE)),
+            np.load(os.path.join(index_dir, POSTINGS_FILE), mmap_mode="r"),
+            np.load(os.path.join(index_dir, FREQS_FILE), mmap_mode="r"),
+            np.load(os.path.join(index_dir, LENGTHS_FILE)),
+        )
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every row for ``query``."""
+        n_rows = len(self.lengths)
+        scores = np.zeros(n_rows, dtype=np.float32)
+        if n_rows == 0:
+            return scores
+
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / (self.avg_length or 1))
+        for token in set(tokenize(query)):
+            term_id = self.terms.get(token)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows = np.asarray(self.postings[start:end])
+            tf = np.asarray(self.freqs[start:end])
+            df = end - start
+            idf = math.log(1 + (n_rows - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm[rows])
+        return scores
+
+    def search(
+        self, query: str, k: int = 4, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the row indices and BM25 scores of the ``k`` best rows.
+
+        Rows without any query term are never returned. If ``rows`` is given,
+        only those rows are considered.
+        """
+        scores = self.scores(query)
+        if rows is not None:
+            mask = np.zeros(len(scores), dtype=bool)
+            mask[rows] = True
+            scores[~mask] = 0
+
+        matching = np.flatnonzero(scores > 0)
+        if len(matching) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        k = min(k, len(matching))
+        top = matching[np.argpartition(-scores[matching], k - 1)[:k]]
+        order = top[np.argsort(-scores[top], kind="stable")]
+        return order, scores[order]
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int = 60) -> np.ndarray:
+    """Fuse several ranked lists of rows with reciprocal-rank fusion.
+
+    Each row scores ``sum(1 / (k + rank))`` over the lists it appears in; rows
+    are returned best first.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+    return np.asarray(
+        sorted(fused, key=lambda row: (-fused[row], row)), dtype=np.int64
+    )
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from neo4j import Driver, GraphDatabase
+
+# Connection pool settings of the shared Neo4j driver. Size the pool for the
+# number of concurrent Streamlit sessions; ``Neo4jTool.pool_metrics`` shows
+# whether requests wait for connections.
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_MAX_CONNECTION_LIFETIME = float(
+    os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600")
+)
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(
+    os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "10")
+)
+NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+
+
+def create_driver(
+    uri: str, auth: Tuple[Optional[str], Optional[str]], **config
+) -> Driver:
+    """Create a Neo4j driver with the pool settings above; ``config`` overrides them."""
+    settings = {
+        "max_connection_pool_size": NEO4J_MAX_POOL_SIZE,
+        "max_connection_lifetime": NEO4J_MAX_CONNECTION_LIFETIME,
+        "connection_acquisition_timeout": NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        "fetch_size": NEO4J_FETCH_SIZE,
+        **config,
+    }
+    return GraphDatabase.driver(uri, auth=auth, **settings)
+
+
+class PoolMetrics:
+    """Connection pool usage of a driver: in use, idle, and acquisition waits.
+
+    The driver does not publish pool metrics, so connection acquisition is
+    timed by wrapping the pool's ``acquire``, and connection counts are read
+    from the pool. Both rely on driver internals; if they change, metrics
+    report what is still available instead of failing queries.
+    """
+
+    def __init__(self, driver: Driver, window: int = 1000):
+        self.driver = driver
+        self._waits = deque(maxlen=window)
+        self._acquisitions = 0
+        self._lock = threading.Lock()
+        pool = getattr(driver, "_pool", None)
+        self._pool = pool
+        if pool is not None and hasattr(pool, "acquire"):
+            acquire = pool.acquire
+
+            def timed_acquire(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return acquire(*args, **kwargs)
+                finally:
+                    self._record((time.perf_counter() - start) * 1000)
+
+            pool.acquire = timed_acquire
+
+    def _record(self, wait_ms: float) -> None:
+        with self._lock:
+            self._acquisitions += 1
+            self._waits.append(wait_ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current pool usage and acquisition wait statistics (milliseconds)."""
+        in_use = idle = 0
+        try:
+            with self._pool.lock:
+                for connections in self._pool.connections.values():
+                    for connection in connections:
+                        if connection.in_use:
+                            in_use += 1
+                        else:
+                            idle += 1
+        except AttributeError:
+            pass
+
+        with self._lock:
+            waits = sorted(self._waits)
+            acquisitions = self._acquisitions
+        return {
+            "max_pool_size": (
+                self._pool.pool_config.max_connection_pool_size
+                if self._pool is not None
+                else NEO4J_MAX_POOL_SIZE
+            ),
+            "in_use": in_use,
+            "idle": idle,
+            "acquisitions": acquisitions,
+            "wait_ms_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_ms_p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            "wait_ms_max": waits[-1] if waits else 0.0,
+        }
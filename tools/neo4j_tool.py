@@ -1,8 +1,60 @@
 import os
+import re
+import threading
+import time
 
 from langchain_neo4j import GraphCypherQAChain, Neo4jGraph
-from langchain_openai import ChatOpenAI
-from neo4j import GraphDatabase
+from langchain_neo4j.chains.graph_qa.cypher import construct_schema
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from neo4j import Query
+from neo4j.exceptions import DriverError, Neo4jError
+from tools.cypher_cache import CypherCache
+from tools.cypher_templates import (
+    TEMPLATES,
+    THERAPEUTIC_CATEGORIES_CYPHER,
+    match_template,
+    merge_category_rows,
+)
+from tools.graph_adjacency import SUBGRAPH_LABELS, GraphAdjacency
+from tools.graph_schema import (
+    fetch_catalog,
+    load_snapshot,
+    save_snapshot,
+    snapshot_path,
+)
+from tools.neo4j_pool import PoolMetrics, create_driver
+from tools.query_guard import NEO4J_QUERY_TIMEOUT, GuardedGraph, QueryGuard
+
+# Seconds between schema fingerprint checks
+SCHEMA_CHECK_INTERVAL = float(os.getenv("NEO4J_SCHEMA_CHECK_INTERVAL", "300"))
+# Seconds before retrying a schema check that failed
+SCHEMA_RETRY_INTERVAL = float(os.getenv("NEO4J_SCHEMA_RETRY_INTERVAL", "30"))
+# Also create the drug lookup index in the background on connect (needs schema
+# privileges); otherwise run ``python -m tools.neo4j_tool ensure-indexes`` once
+ENSURE_INDEXES = os.getenv("NEO4J_ENSURE_INDEXES", "false").lower() == "true"
+DRUG_FULLTEXT_INDEX = "drug_name_fulltext"
+# Answer common question shapes with pre-written Cypher instead of the LLM chain
+USE_CYPHER_TEMPLATES = os.getenv("NEO4J_CYPHER_TEMPLATES", "true").lower() == "true"
+# Rows returned by a templated query
+TEMPLATE_RESULT_LIMIT = int(os.getenv("NEO4J_TEMPLATE_RESULT_LIMIT", "20"))
+# Per-request timeout of the chain's LLM and embedding calls, so a call the
+# agent stopped waiting for (AGENT_TOOL_TIMEOUT) does not hold its worker
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "20"))
+# Serve one- and two-hop drug/manufacturer/category lookups from an in-memory
+# snapshot, re-exported every NEO4J_ADJACENCY_REFRESH_INTERVAL seconds
+USE_ADJACENCY_SNAPSHOT = os.getenv("NEO4J_ADJACENCY_SNAPSHOT", "true").lower() == "true"
+ADJACENCY_REFRESH_INTERVAL = float(
+    os.getenv("NEO4J_ADJACENCY_REFRESH_INTERVAL", "3600")
+)
+
+
+def fulltext_query(term):
+    """Lucene query matching names with a word starting with each word of ``term``.
+
+    Words are split like the index's standard analyzer splits names, which
+    also keeps Lucene operators and special characters out of the query.
+    """
+    return " AND ".join(f"{word}*" for word in re.findall(r"\w+", term.lower()))
 
 
 class Neo4jTool:
@@ -11,61 +63,285 @@ class Neo4jTool:
         self.URI = os.getenv("NEO4J_URI")
         self.AUTH = (os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD"))
         self.driver = None
+        self.metrics = None
+        self.guard = None
         self.graph = None
         self.chain = None
+        self.cypher_cache = None
+        self.schema_snapshot = None
+        self._schema_checked_at = 0.0
+        self._schema_retry_at = 0.0
+        self.drug_indexes = set()
+        self.adjacency = None
+        self._adjacency_stop = threading.Event()
+        self._adjacency_thread = None
 
     def connect(self):
         """Establish connection to Neo4j database"""
         try:
-            self.driver = GraphDatabase.driver(self.URI, auth=self.AUTH)
+            self.driver = create_driver(self.URI, self.AUTH)
             self.driver.verify_connectivity()
+            self.metrics = PoolMetrics(self.driver)
+            self.guard = QueryGuard(self.driver)
             print("✅ Connected to Neo4j!")
 
-            # Initialize LangChain Neo4j graph
+            # Initialize LangChain Neo4j graph; its schema comes from the snapshot.
+            # Neo4jGraph always opens a driver of its own: keep that one minimal
+            # and swap in the shared driver so one pool serves every query.
             self.graph = Neo4jGraph(
-                url=self.URI, username=self.AUTH[0], password=self.AUTH[1]
+                url=self.URI,
+                username=self.AUTH[0],
+                password=self.AUTH[1],
+                refresh_schema=False,
+                driver_config={"max_connection_pool_size": 1},
             )
+            self.graph._driver.close()
+            self.graph._driver = self.driver
+            self.drug_indexes = self._online_drug_indexes()
+            if ENSURE_INDEXES and DRUG_FULLTEXT_INDEX not in self.drug_indexes:
+                threading.Thread(
+                    target=self.ensure_indexes, name="neo4j-ensure-indexes", daemon=True
+                ).start()
+            try:
+                self.load_schema()
+            except Exception as e:
+                print(f"⚠️ Schema snapshot unavailable, introspecting directly: {e}")
+                self._schema_unavailable()
+                self.graph.refresh_schema()
+            if USE_ADJACENCY_SNAPSHOT:
+                self.start_adjacency_refresh()
 
             return True
         except Exception as e:
             print(f"❌ Failed to connect to Neo4j: {e}")
             return False
 
+    def ensure_indexes(self, wait=300):
+        """Idempotently create the full-text index used for drug name lookups.
+
+        Waits up to ``wait`` seconds for the index to come online, then starts
+        using it. Neo4j keeps the index up to date as Drug nodes change.
+        Failures (e.g. a read-only user) are reported and lookups keep
+        scanning the Drug label.
+        """
+        try:
+            with self.driver.session() as session:
+                session.run(
+                    f"CREATE FULLTEXT INDEX {DRUG_FULLTEXT_INDEX} IF NOT EXISTS "
+                    "FOR (d:Drug) ON EACH [d.name]"
+                ).consume()
+                session.run("CALL db.awaitIndexes($wait)", wait=wait).consume()
+            self.drug_indexes = self._online_drug_indexes()
+            print("🗂️ Drug lookup index is in place")
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not provision the drug lookup index: {e}")
+            return False
+
+    def _online_drug_indexes(self):
+        """Names of the drug lookup indexes that exist and are ONLINE."""
+        try:
+            records, _, _ = self.driver.execute_query(
+                "SHOW INDEXES YIELD name, state WHERE name IN $names AND "
+                "state = 'ONLINE' RETURN name",
+                names=[DRUG_FULLTEXT_INDEX],
+            )
+            return {record["name"] for record in records}
+        except Exception as e:
+            print(f"⚠️ Could not list indexes: {e}")
+            return set()
+
+    def _drug_match(self, drug_name, fulltext=True):
+        """Cypher binding ``d`` (and a relevance ``score``) for $drug_name.
+
+        Uses the full-text index (queried with $fulltext_query) when
+        available and ``fulltext`` is set, else a case-insensitive
+        ``CONTAINS`` scan of the Drug label.
+        """
+        if (
+            fulltext
+            and DRUG_FULLTEXT_INDEX in self.drug_indexes
+            and fulltext_query(drug_name)
+        ):
+            return (
+                f"CALL db.index.fulltext.queryNodes('{DRUG_FULLTEXT_INDEX}', "
+                "$fulltext_query) YIELD node AS d, score"
+            )
+        return (
+            "MATCH (d:Drug) WHERE toLower(d.name) CONTAINS toLower($drug_name) "
+            "WITH d, 1.0 AS score"
+        )
+
+    def _run_drug_query(self, cypher, drug_name, **params):
+        """Records of ``cypher`` with its ``{drug_match}`` bound to ``drug_name``.
+
+        The full-text index only matches whole words by prefix, so when it
+        finds nothing the query is run again with the ``CONTAINS`` scan,
+        which also matches inside words.
+        """
+        params = {
+            "drug_name": drug_name,
+            "fulltext_query": fulltext_query(drug_name),
+            **params,
+        }
+        use_fulltext = (
+            "{drug_match}" in cypher
+            and DRUG_FULLTEXT_INDEX in self.drug_indexes
+            and bool(params["fulltext_query"])
+        )
+        for fulltext in [True, False] if use_fulltext else [False]:
+            query = cypher.replace(
+                "{drug_match}", self._drug_match(drug_name, fulltext)
+            )
+            records, _, _ = self.driver.execute_query(
+                Query(query, timeout=NEO4J_QUERY_TIMEOUT), **params
+            )
+            if records:
+                break
+        return records
+
+    def load_schema(self, force=False):
+        """Load the schema snapshot, re-introspecting only if it is out of date.
+
+        The snapshot on disk is reused while the fingerprint of the label,
+        relationship-type and property-key catalogs is unchanged. The result
+        is installed on the LangChain graph and the QA chain.
+        """
+        catalog = fetch_catalog(self.driver)
+        path = snapshot_path(self.URI)
+        snapshot = None if force else load_snapshot(path)
+        if snapshot is not None and snapshot["fingerprint"] == catalog["fingerprint"]:
+            print("📦 Using cached graph schema")
+        else:
+            print("🔄 Refreshing graph schema snapshot...")
+            self.graph.refresh_schema()
+            snapshot = {
+                **catalog,
+                "drug_properties": self._drug_properties(catalog["labels"]),
+                "schema": self.graph.schema,
+                "structured_schema": self.graph.structured_schema,
+            }
+            save_snapshot(path, snapshot)
+
+        self.graph.schema = snapshot["schema"]
+        self.graph.structured_schema = snapshot["structured_schema"]
+        if self.chain is not None and (
+            self.schema_snapshot is None
+            or self.schema_snapshot["fingerprint"] != snapshot["fingerprint"]
+        ):
+            self.chain.graph_schema = construct_schema(
+                self.graph.get_structured_schema, [], [], self.graph._enhanced_schema
+            )
+        self.schema_snapshot = snapshot
+        self._schema_checked_at = time.monotonic()
+        return snapshot
+
+    def load_adjacency(self, force=False):
+        """Load the adjacency snapshot, exporting it again if it is out of date.
+
+        The snapshot on disk is reused while it is younger than
+        ``ADJACENCY_REFRESH_INTERVAL`` and was taken with the current schema
+        fingerprint. Lookups keep using the previous snapshot until the new
+        one is ready.
+        """
+        path = snapshot_path(self.URI, kind="adjacency", extension="npz")
+        fingerprint = (
+            self.schema_snapshot["fingerprint"] if self.schema_snapshot else None
+        )
+        adjacency = None if force else GraphAdjacency.load(path)
+        if (
+            adjacency is not None
+            and adjacency.fingerprint == fingerprint
+            and time.time() - adjacency.created_at < ADJACENCY_REFRESH_INTERVAL
+        ):
+            print("📦 Using cached graph adjacency snapshot")
+        else:
+            labels = SUBGRAPH_LABELS
+            if self.schema_snapshot and self.schema_snapshot["labels"]:
+                labels = [
+                    label for label in labels if label in self.schema_snapshot["labels"]
+                ]
+            print("🔄 Exporting graph adjacency snapshot...")
+            start = time.perf_counter()
+            adjacency = GraphAdjacency.export(
+                self.driver, labels, fingerprint=fingerprint
+            )
+            adjacency.save(path)
+            print(
+                f"🗂️ Adjacency snapshot: {adjacency.node_count} nodes, "
+                f"{adjacency.edge_count} relationships "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+        self.adjacency = adjacency
+        return adjacency
+
+    def start_adjacency_refresh(self):
+        """Load the adjacency snapshot and keep refreshing it in the background."""
+        try:
+            self.load_adjacency()
+        except Exception as e:
+            print(f"⚠️ Adjacency snapshot unavailable, querying Neo4j: {e}")
+        if self._adjacency_thread is not None:
+            return
+
+        def refresh():
+            while not self._adjacency_stop.wait(ADJACENCY_REFRESH_INTERVAL):
+                try:
+                    self.load_adjacency(force=True)
+                except Exception as e:
+                    print(f"⚠️ Adjacency snapshot refresh failed: {e}")
+
+        self._adjacency_thread = threading.Thread(
+            target=refresh, name="neo4j-adjacency-refresh", daemon=True
+        )
+        self._adjacency_thread.start()
+
+    def _drug_properties(self, labels):
+        """Property keys of a Drug node, as a sample of the Drug schema."""
+        if "Drug" not in labels:
+            return []
+        records, _, _ = self.driver.execute_query(
+            "MATCH (d:Drug) RETURN keys(d) AS properties LIMIT 1"
+        )
+        return records[0]["properties"] if records else []
+
     def get_schema_info(self):
         """Get database schema information to understand available properties"""
         if not self.driver:
             print("❌ Driver not initialized. Call connect() first.")
             return None
-        
-        try:
-            with self.driver.session() as session:
-                # Get node labels
-                labels_result = session.run("CALL db.labels() YIELD label RETURN label")
-                labels = [record["label"] for record in labels_result]
-                
-                # Get relationship types
-                rels_result = session.run("CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType")
-                rels = [record["relationshipType"] for record in rels_result]
-                
-                # Get properties for Drug nodes
-                if "Drug" in labels:
-                    drug_props_result = session.run("""
-                        MATCH (d:Drug) 
-                        RETURN keys(d) as properties 
-                        LIMIT 1
-                    """)
-                    drug_props = list(drug_props_result)[0]["properties"] if drug_props_result.peek() else []
-                else:
-                    drug_props = []
-                
-                return {
-                    "labels": labels,
-                    "relationship_types": rels,
-                    "drug_properties": drug_props
-                }
-        except Exception as e:
-            print(f"❌ Error getting schema info: {e}")
-            return None
+
+        now = time.monotonic()
+        if (
+            self.schema_snapshot is None
+            or now - self._schema_checked_at > SCHEMA_CHECK_INTERVAL
+        ) and now >= self._schema_retry_at:
+            try:
+                self.load_schema()
+            except Exception as e:
+                print(f"❌ Error getting schema info: {e}")
+                self._schema_unavailable()
+        return {
+            "labels": self.schema_snapshot["labels"],
+            "relationship_types": self.schema_snapshot["relationship_types"],
+            "drug_properties": self.schema_snapshot["drug_properties"],
+        }
+
+    def _schema_unavailable(self):
+        """Back off after a failed schema check, keeping a fallback snapshot.
+
+        Without a current snapshot, the last one saved for this database is
+        used, else an empty catalog (no known labels or properties).
+        """
+        self._schema_retry_at = time.monotonic() + SCHEMA_RETRY_INTERVAL
+        if self.schema_snapshot is None:
+            self.schema_snapshot = load_snapshot(snapshot_path(self.URI)) or {
+                "labels": [],
+                "relationship_types": [],
+                "property_keys": [],
+                "drug_properties": [],
+                "fingerprint": None,
+            }
 
     def initialize_qa_chain(self, openai_api_key=None):
         """Initialize the GraphCypherQAChain for natural language queries"""
@@ -83,16 +359,33 @@ class Neo4jTool:
                 return False
 
             # Initialize the language model
-            llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo", api_key=api_key)
+            llm = ChatOpenAI(
+                temperature=0,
+                model="gpt-3.5-turbo",
+                api_key=api_key,
+                timeout=OPENAI_TIMEOUT,
+                max_retries=1,
+            )
 
-            # Initialize the QA chain
+            # Initialize the QA chain; its generated Cypher runs through the guard
             self.chain = GraphCypherQAChain.from_llm(
                 llm=llm,
-                graph=self.graph,
+                graph=GuardedGraph(self.graph, self.guard),
                 verbose=True,
                 return_direct=False,
                 allow_dangerous_requests=True,
                 top_k=5,
+                return_intermediate_steps=True,
+            )
+            self.cypher_cache = CypherCache(
+                OpenAIEmbeddings(
+                    model="text-embedding-3-small",
+                    api_key=api_key,
+                    timeout=OPENAI_TIMEOUT,
+                    max_retries=1,
+                ),
+                threshold=float(os.getenv("NEO4J_CYPHER_CACHE_THRESHOLD", "0.95")),
+                max_entries=int(os.getenv("NEO4J_CYPHER_CACHE_SIZE", "256")),
             )
 
             print("🤖 GraphCypherQAChain initialized successfully!")
@@ -109,89 +402,204 @@ class Neo4jTool:
             return "Error: QA chain not initialized"
 
         try:
+            templated = self._answer_from_template(question)
+            if templated is not None:
+                return templated
+
+            entry, vector = (
+                self.cypher_cache.lookup(question)
+                if self.cypher_cache is not None
+                else (None, None)
+            )
+            if entry is not None:
+                cached = self._answer_from_cached_cypher(question, entry)
+                if cached is not None:
+                    return cached
+
             result = self.chain.invoke({"query": question})
+            steps = result.pop("intermediate_steps", [])
+            cypher = steps[0].get("query") if steps else None
+            context = steps[1].get("context") if len(steps) > 1 else None
+            # Only queries that ran and found something count as validated
+            if self.cypher_cache is not None and cypher and context:
+                self.cypher_cache.store(question, cypher, vector)
             return result
         except Exception as e:
             print(f"❌ Error asking question: {e}")
             return f"Error: {str(e)}"
 
-    def get_therapeutic_categories_for_drug(self, drug_name):
-        """Get therapeutic categories for drugs containing a specific substance"""
+    def _answer_from_template(self, question):
+        """Answer a question matching a Cypher template, without any LLM call.
+
+        Returns ``{"query", "result", "template"}`` with the rows
+        of the templated query, or None when no template applies or it finds
+        nothing, so the caller falls back to the chain.
+        """
+        if not USE_CYPHER_TEMPLATES or not self.driver:
+            return None
+        schema_info = self.get_schema_info()
+        # An empty catalog means the schema is unknown, not that labels are missing
+        labels = (
+            schema_info["labels"] if schema_info and schema_info["labels"] else None
+        )
+        matched = match_template(question, labels)
+        if matched is None:
+            return None
+
+        template, entity = matched
+        adjacency = self.adjacency
+        if adjacency is not None and template.local is not None:
+            rows = template.local(adjacency, entity, TEMPLATE_RESULT_LIMIT)
+            if rows:
+                print(
+                    f"⚡ Answered '{template.name}' ({entity}) from adjacency snapshot"
+                )
+                return {"query": question, "result": rows, "template": template.name}
+
+        rows = self._run_template(template, entity, TEMPLATE_RESULT_LIMIT)
+        if not rows:
+            return None
+        print(f"🧩 Answered with Cypher template '{template.name}' ({entity})")
+        return {"query": question, "result": rows, "template": template.name}
+
+    def _run_template(self, template, entity, limit):
+        """Run a template's query for ``entity``; None if the database fails it.
+
+        Only driver and query errors fall back to the chain: anything else is
+        a broken template and is raised.
+        """
+        # ``$drug_name`` is bound by ``_run_drug_query`` itself
+        params = {"limit": limit}
+        if template.parameter != "drug_name":
+            params[template.parameter] = entity
+        try:
+            records = self._run_drug_query(template.cypher, entity, **params)
+        except (Neo4jError, DriverError) as e:
+            print(f"⚠️ Cypher template '{template.name}' failed: {e}")
+            return None
+        return template.postprocess([record.data() for record in records])
+
+    def _answer_from_cached_cypher(self, question, entry):
+        """Answer with previously validated Cypher, skipping Cypher generation.
+
+        Returns None when the cached query fails, so the caller falls back to
+        the full chain.
+        """
+        try:
+            context = self.guard.run(entry["cypher"])[: self.chain.top_k]
+        except Exception as e:
+            print(f"⚠️ Cached Cypher failed, regenerating: {e}")
+            self.cypher_cache.discard(entry)
+            return None
+
+        print(f"♻️ Reusing cached Cypher: {entry['cypher']}")
+        answer = self.chain.qa_chain.invoke({"question": question, "context": context})
+        return {"query": question, self.chain.output_key: answer}
+
+    def get_therapeutic_categories_for_drug(self, drug_name, limit=20):
+        """Get therapeutic categories for drugs containing a specific substance.
+
+        One query matches the drugs through the lookup index and gathers
+        their category properties and related category nodes in a ``CALL {}``
+        subquery. Returns ``{"query": drug_name, "drugs": [...]}`` with one
+        entry per distinct drug name, best matches first.
+        """
         if not self.driver:
             print("❌ Driver not initialized. Call connect() first.")
             return "Error: Driver not initialized"
-        
+
+        schema_info = self.get_schema_info()
+        if not schema_info:
+            return "Error: Could not retrieve database schema"
+        if (
+            schema_info["drug_properties"]
+            and "name" not in schema_info["drug_properties"]
+        ):
+            return (
+                "Database schema doesn't contain expected properties. "
+                f"Available properties: {schema_info['drug_properties']}"
+            )
+
         try:
-            with self.driver.session() as session:
-                # First, let's get the schema to understand available properties
-                schema_info = self.get_schema_info()
-                if not schema_info:
-                    return "Error: Could not retrieve database schema"
-                
-                print(f"Available Drug properties: {schema_info['drug_properties']}")
-                
-                # Try different approaches based on available properties
-                if "name" in schema_info['drug_properties']:
-                    results = []
-                    
-                    # Query 1: Find drugs by name containing the substance
-                    try:
-                        result1 = session.run("""
-                            MATCH (d:Drug)
-                            WHERE toLower(d.name) CONTAINS toLower($drug_name)
-                            RETURN DISTINCT d.name as drug_name, d.category as category, d.type as type
-                            LIMIT 20
-                        """, {"drug_name": drug_name})
-                        records1 = list(result1)
-                        if records1:
-                            results.append(f"Query 1 results: {records1}")
-                    except Exception as e:
-                        results.append(f"Query 1 failed: {str(e)}")
-                    
-                    # Query 2: Look for therapeutic information in any available property
-                    try:
-                        result2 = session.run("""
-                            MATCH (d:Drug)
-                            WHERE toLower(d.name) CONTAINS toLower($drug_name)
-                            RETURN DISTINCT d.name as drug_name, 
-                                   [prop in keys(d) WHERE prop CONTAINS 'category' OR prop CONTAINS 'therapeutic' OR prop CONTAINS 'type' | prop] as relevant_properties
-                            LIMIT 10
-                        """, {"drug_name": drug_name})
-                        records2 = list(result2)
-                        if records2:
-                            results.append(f"Query 2 results: {records2}")
-                    except Exception as e:
-                        results.append(f"Query 2 failed: {str(e)}")
-                    
-                    # Query 3: Find relationships to therapeutic categories if they exist
-                    try:
-                        result3 = session.run("""
-                            MATCH (d:Drug)-[r]-(related)
-                            WHERE toLower(d.name) CONTAINS toLower($drug_name)
-                            AND (related:Category OR related:TherapeuticCategory OR related:Type)
-                            RETURN DISTINCT d.name as drug_name, type(r) as relationship_type, related.name as category_name
-                            LIMIT 20
-                        """, {"drug_name": drug_name})
-                        records3 = list(result3)
-                        if records3:
-                            results.append(f"Query 3 results: {records3}")
-                    except Exception as e:
-                        results.append(f"Query 3 failed: {str(e)}")
-                    
-                    if results:
-                        return f"Found information for drugs containing '{drug_name}':\n" + "\n".join(results)
-                    else:
-                        return f"No drugs found containing '{drug_name}' or no therapeutic category information available."
-                
-                else:
-                    return f"Database schema doesn't contain expected properties. Available properties: {schema_info['drug_properties']}"
-                    
+            records = self._run_drug_query(
+                THERAPEUTIC_CATEGORIES_CYPHER, drug_name, limit=limit
+            )
         except Exception as e:
             print(f"❌ Error in therapeutic categories query: {e}")
             return f"Error: {str(e)}"
 
+        # Several nodes can share a name; merge them into one entry
+        drugs = merge_category_rows([record.data() for record in records])
+        return {"query": drug_name, "drugs": drugs}
+
+    def pool_metrics(self):
+        """Connection pool usage of the shared driver (see ``PoolMetrics``)."""
+        if self.metrics is None:
+            return {}
+        return self.metrics.snapshot()
+
+    def guard_stats(self):
+        """Executed, rejected and timed out generated queries (see ``QueryGuard``)."""
+        if self.guard is None:
+            return {}
+        return self.guard.stats()
+
     def close(self):
         """Close the database connection"""
+        self._adjacency_stop.set()
         if self.driver:
             self.driver.close()
             print("🔌 Neo4j connection closed.")
+
+
+class _TemplateCheckDriver:
+    """Stub driver failing any query that references an unbound parameter."""
+
+    def execute_query(self, query, **params):
+        missing = set(re.findall(r"\$(\w+)", query.text)) - set(params)
+        if missing:
+            raise AssertionError(f"unbound parameters {sorted(missing)}")
+        return [], None, None
+
+
+def check_templates():
+    """Run every Cypher template through ``_run_template`` on a stub driver."""
+    tool = Neo4jTool()
+    tool.driver = _TemplateCheckDriver()
+    failed = 0
+    for indexes in (set(), {DRUG_FULLTEXT_INDEX}):
+        tool.drug_indexes = indexes
+        for template in TEMPLATES:
+            try:
+                tool._run_template(template, "tramadol", TEMPLATE_RESULT_LIMIT)
+            except Exception as e:
+                failed += 1
+                print(f"❌ Template '{template.name}' ({sorted(indexes)}): {e}")
+    if not failed:
+        print(f"✅ {len(TEMPLATES)} Cypher templates bind their parameters")
+    return not failed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Neo4j knowledge graph setup.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser(
+        "ensure-indexes", help="Create the drug name full-text index and wait for it"
+    )
+    subparsers.add_parser(
+        "check-templates", help="Run every Cypher template against a stub driver"
+    )
+    args = parser.parse_args()
+
+    if args.command == "check-templates":
+        raise SystemExit(0 if check_templates() else 1)
+
+    tool = Neo4jTool()
+    tool.driver = create_driver(tool.URI, tool.AUTH)
+    try:
+        ok = tool.ensure_indexes()
+    finally:
+        tool.close()
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,169 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from tools.embedding_cache import EmbeddingCache
+
+PARSER = "pymupdf"
+EMBED_BATCH_SIZE = int(os.getenv("PDF_EMBED_BATCH_SIZE", "256"))
+EMBED_MAX_WORKERS = int(os.getenv("PDF_EMBED_MAX_WORKERS", "4"))
+
+_YEAR_PATTERN = re.compile(r"(?<!\d)(?:19|20)\d{2}(?!\d)")
+
+
+def discover_pdfs(corpus_path: str) -> List[str]:
+    """Return the PDFs under ``corpus_path`` (a single file or a directory)."""
+    if os.path.isfile(corpus_path):
+        return [corpus_path]
+    if not os.path.isdir(corpus_path):
+        raise FileNotFoundError(f"PDF corpus not found: {corpus_path}")
+
+    pdf_paths = []
+    for root, _, files in os.walk(corpus_path):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                pdf_paths.append(os.path.join(root, name))
+    return sorted(pdf_paths)
+
+
+def document_metadata(pdf_path: str) -> Dict:
+    """Derive document name and report years from a PDF file name.
+
+    ``report_2023_2024.pdf`` becomes ``{"document": "report_2023_2024",
+    "years": [2023, 2024]}``.
+    """
+    document = os.path.splitext(os.path.basename(pdf_path))[0]
+    years = sorted({int(y) for y in _YEAR_PATTERN.findall(document)})
+    return {"document": document, "years": years}
+
+
+def _parse_and_split(
+    pdf_path: str, chunk_size: int, chunk_overlap: int
+) -> Tuple[List[Tuple[str, Dict]], int]:
+    """Parse one PDF with PyMuPDF and split it into chunks.
+
+    Runs inside a worker process, so it only returns plain, picklable data:
+    a list of ``(text, metadata)`` pairs and the page count.
+    """
+    base_metadata = {"source": pdf_path, **document_metadata(pdf_path)}
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+    chunks = []
+    with fitz.open(pdf_path) as pdf:
+        page_count = pdf.page_count
+        for page_number, page in enumerate(pdf):
+            text = page.get_text()
+            if not text.strip():
+                continue
+            for split in text_splitter.split_text(text):
+                chunks.append((split, {**base_metadata, "page": page_number}))
+    return chunks, page_count
+
+
+def embed_in_batches(
+    embeddings: Embeddings,
+    texts: List[str],
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_workers: int = EMBED_MAX_WORKERS,
+) -> np.ndarray:
+    """Embed ``texts`` in batches sent concurrently from a thread pool."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        results = list(pool.map(embeddings.embed_documents, batches))
+    return np.asarray([v for batch in results for v in batch], dtype=np.float32)
+
+
+def ingest_corpus(
+    pdf_paths: List[str],
+    keys: List[str],
+    embeddings: Embeddings,
+    cache: EmbeddingCache,
+    chunk_size: int,
+    chunk_overlap: int,
+    max_workers: Optional[int] = None,
+    reusable: Optional[Dict[str, Tuple[List[Document], np.ndarray]]] = None,
+) -> Tuple[List[Document], np.ndarray]:
+    """Return the chunks and embeddings of every PDF in ``pdf_paths``.
+
+    ``keys`` are the matching embedding cache keys. Documents in
+    ``reusable`` (chunks already held by a previous index) are taken as is,
+    and documents found in the embedding cache are loaded from disk. The
+    others are parsed and split in a process pool, embedded in concurrent
+    batches and written back to the cache.
+    """
+    per_document: Dict[str, Tuple[List[Document], np.ndarray]] = dict(
+        reusable or {}
+    )
+    missing = []
+    for path, key in zip(pdf_paths, keys):
+        if key in per_document:
+            continue
+        cached = cache.load(key)
+        if cached is None:
+            missing.append((path, key))
+        else:
+            per_document[key] = cached
+    print(f"📚 {len(pdf_paths) - len(missing)} up to date, {len(missing)} to ingest")
+
+    if missing:
+        paths = [path for path, _ in missing]
+        if len(paths) == 1:
+            parsed = [_parse_and_split(paths[0], chunk_size, chunk_overlap)]
+        else:
+            workers = min(max_workers or os.cpu_count() or 1, len(paths))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = list(
+                    pool.map(
+                        _parse_and_split,
+                        paths,
+                        [chunk_size] * len(paths),
+                        [chunk_overlap] * len(paths),
+                    )
+                )
+
+        # Embed the chunks of all new documents together so batches stay full
+        all_texts = [text for chunks, _ in parsed for text, _ in chunks]
+        all_vectors = embed_in_batches(embeddings, all_texts)
+
+        offset = 0
+        for (path, key), (chunks, page_count) in zip(missing, parsed):
+            docs = [
+                Document(
+                    page_content=text,
+                    metadata={
+                        **metadata,
+                        "total_pages": page_count,
+                        "chunk_id": f"{key[:16]}-{i}",
+                    },
+                )
+                for i, (text, metadata) in enumerate(chunks)
+            ]
+            vectors = all_vectors[offset : offset + len(docs)]
+            offset += len(docs)
+            cache.save(key, docs, vectors)
+            per_document[key] = (docs, vectors)
+            print(f"📄 Ingested {path}: {page_count} pages, {len(docs)} chunks")
+
+    all_docs: List[Document] = []
+    vector_blocks = []
+    for key in keys:
+        docs, vectors = per_document[key]
+        all_docs.extend(docs)
+        if len(docs):
+            vector_blocks.append(np.asarray(vectors, dtype=np.float32))
+    all_vectors = (
+        np.vstack(vector_blocks) if vector_blocks else np.zeros((0, 0), np.float32)
+    )
+    return all_docs, all_vectors
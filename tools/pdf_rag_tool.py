@@ -1,69 +1,279 @@
+import hashlib
+import json
 import os
-from typing import List, Optional, Tuple
+import re
+import shutil
+from typing import List, Optional, Set, Tuple
 
+import numpy as np
 from dotenv import load_dotenv
-from langchain_community.vectorstores import InMemoryVectorStore
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from tools.corpus_manifest import CorpusManifest
+from tools.embedding_cache import EmbeddingCache
+from tools.lexical_index import reciprocal_rank_fusion
+from tools.pdf_ingest import discover_pdfs, ingest_corpus
+from tools.query_cache import PersistentLRUCache, normalize_question
+from tools.vector_index import FORMAT_VERSION, META_FILE, VectorIndex
 
 load_dotenv()
 
+EMBEDDING_MODEL = "text-embedding-3-large"
+LLM_MODEL = "gpt-4"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+INDEX_DTYPE = os.getenv("PDF_INDEX_DTYPE", "float32")
+RETRIEVAL_K = 4
+# Candidates taken from each retriever before reciprocal-rank fusion
+FUSION_CANDIDATES = 20
+SEARCH_MODES = ("hybrid", "vector", "keyword")
+QUERY_CACHE_SIZE = int(os.getenv("PDF_QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("PDF_QUERY_CACHE_TTL", "86400"))
+# Per-request timeout of the answering LLM; it bounds a call the agent has
+# already given up on (AGENT_TOOL_TIMEOUT) instead of the client's 10 minutes
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "20"))
+
 
 class PDFTool:
-    def __init__(self):
-        self.vector_store: Optional[InMemoryVectorStore] = None
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.vector_store: Optional[VectorIndex] = None
         self.embeddings: Optional[OpenAIEmbeddings] = None
         self.llm: Optional[ChatOpenAI] = None
+        self.embedding_cache = EmbeddingCache(cache_dir)
+        query_cache_path = os.path.join(
+            self.embedding_cache.cache_dir, "query_cache.sqlite"
+        )
+        self.query_embedding_cache = PersistentLRUCache(
+            query_cache_path,
+            namespace=f"query_embedding:{EMBEDDING_MODEL}",
+            max_entries=QUERY_CACHE_SIZE,
+            ttl=QUERY_CACHE_TTL,
+            encode=lambda vector: np.asarray(vector, dtype=np.float32).tobytes(),
+            decode=lambda blob: np.frombuffer(blob, dtype=np.float32),
+        )
+        self.answer_cache = PersistentLRUCache(
+            query_cache_path,
+            namespace=f"answer:{LLM_MODEL}",
+            max_entries=QUERY_CACHE_SIZE,
+            ttl=QUERY_CACHE_TTL,
+        )
         self._initialize_components()
 
     def _initialize_components(self):
         """Initialize embeddings and LLM components."""
         if not self.embeddings:
             self.embeddings = OpenAIEmbeddings(
-                model="text-embedding-3-large", api_key=os.getenv("OPENAI_API_KEY")
+                model=EMBEDDING_MODEL, api_key=os.getenv("OPENAI_API_KEY")
             )
 
         if not self.llm:
             self.llm = ChatOpenAI(
-                model="gpt-4", temperature=0, api_key=os.getenv("OPENAI_API_KEY")
+                model=LLM_MODEL,
+                temperature=0,
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=OPENAI_TIMEOUT,
+                max_retries=1,
             )
 
-    def create_vector_store(self, pdf_path: str = "./pdf_data/report_2023_2024.pdf"):
-        """Create and populate the vector store with PDF content."""
+    def _manifest_path(self, dtype: str) -> str:
+        return os.path.join(self.embedding_cache.cache_dir, f"manifest-{dtype}.json")
 
-        # Load and process PDF
-        try:
-            loader = PyPDFLoader(pdf_path)
-            docs = loader.load()
+    def build_index(self, corpus_path: str, dtype: str = INDEX_DTYPE) -> str:
+        """Build the memory-mapped vector index for a corpus and return its path.
 
-            # Split documents into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000, chunk_overlap=200
-            )
-            all_splits = text_splitter.split_documents(docs)
+        ``corpus_path`` is a directory of PDFs or a single PDF. Chunk embeddings
+        are cached per document under a key derived from the PDF contents, the
+        parser, the splitter parameters and the embedding model. The index
+        directory is named after the combined document keys, so an existing
+        index for the same corpus is reused as is.
 
-            # Create in-memory vector store
-            self.vector_store = InMemoryVectorStore.from_documents(
-                documents=all_splits,
-                embedding=self.embeddings
-            )
-            
-            print(f"Successfully processed {len(all_splits)} document chunks")
+        A manifest of the indexed files makes rebuilds incremental: unchanged
+        documents are copied from the previous index, only new or modified PDFs
+        are parsed and embedded, and chunks of deleted PDFs are dropped.
+
+        Old index directories are pruned with ``_prune_indexes``. That keeps
+        the index just replaced for readers still using it, and never touches
+        a directory no build created.
+        """
+        pdf_paths = discover_pdfs(corpus_path)
+        manifest = CorpusManifest.load(self._manifest_path(dtype))
+        keys = manifest.document_keys(
+            pdf_paths, EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP
+        )
+        corpus_key = hashlib.sha256(
+            "\n".join([f"format-{FORMAT_VERSION}", *keys]).encode("utf-8")
+        ).hexdigest()
+        index_dir = os.path.join(
+            self.embedding_cache.cache_dir, f"index-{corpus_key}-{dtype}"
+        )
+        if os.path.exists(os.path.join(index_dir, META_FILE)):
+            if manifest.index_dir != index_dir:
+                manifest.record(pdf_paths, keys, VectorIndex.load(index_dir))
+                manifest.save()
+            return index_dir
+
+        changes = manifest.diff(pdf_paths, keys)
+        print(
+            f"🔄 Re-indexing PDF corpus: {len(changes['added'])} added, "
+            f"{len(changes['changed'])} changed, {len(changes['removed'])} removed"
+        )
+        previous = manifest.open_index()
+        all_splits, vectors = ingest_corpus(
+            pdf_paths,
+            keys,
+            self.embeddings,
+            self.embedding_cache,
+            CHUNK_SIZE,
+            CHUNK_OVERLAP,
+            reusable=manifest.reusable_chunks(keys, previous, self.embedding_cache),
+        )
+        VectorIndex.build(
+            index_dir,
+            all_splits,
+            vectors,
+            model=EMBEDDING_MODEL,
+            dtype=dtype,
+            key=corpus_key,
+        )
+        print(f"Built vector index for {len(pdf_paths)} PDFs at {index_dir}")
+
+        manifest.record(pdf_paths, keys, VectorIndex.load(index_dir))
+        manifest.save()
+        self._prune_indexes(
+            dtype, keep={index_dir, previous.index_dir if previous else index_dir}
+        )
+        return index_dir
+
+    def _prune_indexes(self, dtype: str, keep: Set[str]) -> None:
+        """Delete index directories of ``dtype`` built here and no longer used.
+
+        Only ``index-<corpus key>-<dtype>`` directories under the cache dir
+        are considered. Those in ``keep`` or recorded by any manifest stay.
+        """
+        cache_dir = self.embedding_cache.cache_dir
+        keep = {os.path.abspath(path) for path in keep}
+        for name in os.listdir(cache_dir):
+            if name.startswith("manifest-") and name.endswith(".json"):
+                index_dir = CorpusManifest.load(os.path.join(cache_dir, name)).index_dir
+                if index_dir:
+                    keep.add(os.path.abspath(index_dir))
+
+        built = re.compile(rf"index-[0-9a-f]{{64}}-{re.escape(dtype)}")
+        for name in os.listdir(cache_dir):
+            path = os.path.abspath(os.path.join(cache_dir, name))
+            if built.fullmatch(name) and path not in keep and os.path.isdir(path):
+                print(f"🧹 Removing unused vector index {path}")
+                shutil.rmtree(path, ignore_errors=True)
+
+    def create_vector_store(
+        self,
+        corpus_path: str = "./pdf_data",
+        dtype: str = INDEX_DTYPE,
+    ):
+        """Open the vector index for a PDF corpus, building it first if needed."""
+        try:
+            index_dir = self.build_index(corpus_path, dtype)
+            self.vector_store = VectorIndex.load(index_dir)
+            print(f"Loaded vector index with {len(self.vector_store)} chunks")
 
         except FileNotFoundError:
-            print(f"PDF file not found: {pdf_path}")
+            print(f"PDF corpus not found: {corpus_path}")
             raise
         except Exception as e:
-            print(f"Error processing PDF: {e}")
+            print(f"Error processing PDF corpus: {e}")
             raise
 
+    def _filter_rows(
+        self, year: Optional[int] = None, document: Optional[str] = None
+    ) -> Optional[np.ndarray]:
+        """Return the index rows matching the year/document filters, if any."""
+        if year is None and document is None:
+            return None
+
+        rows = None
+        if year is not None:
+            rows = self.vector_store.rows_where("years", int(year))
+        if document is not None:
+            needle = document.lower()
+            matches = [
+                self.vector_store.rows_where("document", name)
+                for name in self.vector_store.values_of("document")
+                if needle in name.lower()
+            ]
+            doc_rows = (
+                np.unique(np.concatenate(matches))
+                if matches
+                else np.empty(0, dtype=np.int64)
+            )
+            rows = doc_rows if rows is None else np.intersect1d(rows, doc_rows)
+        return rows
+
+    def _embed_query(self, question: str) -> np.ndarray:
+        """Embed a question, reusing cached embeddings of repeated questions."""
+        key = normalize_question(question)
+        vector = self.query_embedding_cache.get(key)
+        if vector is None:
+            vector = np.asarray(self.embeddings.embed_query(question), np.float32)
+            self.query_embedding_cache.set(key, vector)
+        return vector
+
+    def cache_stats(self) -> dict:
+        """Hit rates of the query-embedding and answer caches."""
+        return {
+            "query_embedding": self.query_embedding_cache.stats(),
+            "answer": self.answer_cache.stats(),
+        }
+
+    def retrieve(
+        self,
+        question: str,
+        k: int = RETRIEVAL_K,
+        year: Optional[int] = None,
+        document: Optional[str] = None,
+        mode: str = "hybrid",
+    ) -> List[Document]:
+        """Return the ``k`` chunks most relevant to ``question``.
+
+        ``mode`` is "vector" (embedding similarity), "keyword" (BM25 over the
+        inverted index, no embedding call) or "hybrid" (both, fused with
+        reciprocal-rank fusion).
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode!r}, expected {SEARCH_MODES}")
+
+        rows = self._filter_rows(year, document)
+        lexical = self.vector_store.lexical
+        if lexical is None:
+            mode = "vector"
+        candidates = FUSION_CANDIDATES if mode == "hybrid" else k
+
+        rankings = []
+        if mode in ("hybrid", "vector"):
+            query_vector = self._embed_query(question)
+            rankings.append(self.vector_store.search(query_vector, candidates, rows)[0])
+        if mode in ("hybrid", "keyword"):
+            rankings.append(lexical.search(question, candidates, rows)[0])
+
+        top_rows = reciprocal_rank_fusion(rankings)[:k]
+        return [self.vector_store.docs[row] for row in top_rows]
+
     def search_text(
-        self, question: str, chat_history: Optional[List[str]] = None
+        self,
+        question: str,
+        chat_history: Optional[List[str]] = None,
+        year: Optional[int] = None,
+        document: Optional[str] = None,
+        mode: str = "hybrid",
     ) -> Tuple[List, str]:
-        """Search for relevant content and generate a response."""
-        if not self.vector_store:
+        """Search for relevant content and generate a response.
+
+        ``year`` and ``document`` restrict retrieval to chunks from reports
+        covering that year or whose document name contains that string;
+        ``mode`` selects the retriever (see ``retrieve``).
+        """
+        if self.vector_store is None:
             raise ValueError(
                 "Vector store not initialized. Call create_vector_store() first."
             )
@@ -75,9 +285,27 @@ class PDFTool:
             chat_history = []
 
         # Search for relevant documents
-        retrieved_docs = self.vector_store.similarity_search(question, k=4)
+        retrieved_docs = self.retrieve(
+            question, year=year, document=document, mode=mode
+        )
         docs_content = "\n\n".join(doc.page_content for doc in retrieved_docs)
 
+        # Reuse the answer to the same question over the same chunks
+        answer_key = json.dumps(
+            [
+                normalize_question(question),
+                [doc.metadata.get("chunk_id") for doc in retrieved_docs],
+                chat_history,
+            ]
+        )
+        cached_answer = self.answer_cache.get(answer_key)
+        if cached_answer is not None:
+            print(
+                "♻️ PDF answer cache hit "
+                f"(hit rate {self.answer_cache.stats()['hit_rate']:.0%})"
+            )
+            return retrieved_docs, cached_answer
+
         # Create prompt template
         template = """Use the following pieces of context to answer the question at the end.
         If you don't know the answer, just say that you don't know, don't try to make up an answer.
@@ -101,4 +329,27 @@ class PDFTool:
         )
 
         response = self.llm.invoke(messages)
-        return retrieved_docs, str(response.content)
+        answer = str(response.content)
+        self.answer_cache.set(answer_key, answer)
+        return retrieved_docs, answer
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Build the memory-mapped vector index for a PDF corpus offline."
+    )
+    parser.add_argument(
+        "corpus_path", help="Directory of PDFs (or a single PDF) to index"
+    )
+    parser.add_argument(
+        "--dtype",
+        choices=["float32", "float16"],
+        default=INDEX_DTYPE,
+        help="Storage type of the vector matrix",
+    )
+    parser.add_argument("--cache-dir", default=None, help="Cache/index directory")
+    args = parser.parse_args()
+
+    print(PDFTool(cache_dir=args.cache_dir).build_index(args.corpus_path, args.dtype))
@@ -0,0 +1,196 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, key)
+)
+"""
+_USED_AT_INDEX = (
+    "CREATE INDEX IF NOT EXISTS cache_used_at ON cache (namespace, used_at)"
+)
+# Keeps the ``max_entries`` most recently used rows of a namespace
+_PRUNE = """
+DELETE FROM cache WHERE rowid IN (
+    SELECT rowid FROM cache WHERE namespace = ?
+    ORDER BY used_at DESC LIMIT -1 OFFSET ?
+)
+"""
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form of a question for exact-match caching."""
+    text = re.sub(r"\s+", " ", question.strip().lower())
+    return text.rstrip(" ?!.")
+
+
+class PersistentLRUCache:
+    """Bounded in-memory LRU with a TTL, backed by a SQLite file.
+
+    Lookups hit the in-process LRU first and fall back to SQLite, so entries
+    survive restarts and are shared by every worker process on the host.
+    Entries older than ``ttl`` seconds count as misses for ``get``; ``lookup``
+    still returns them, flagged as stale, for another ``stale_ttl`` seconds.
+    Values go through ``encode``/``decode`` on their way to and from SQLite.
+    The SQLite table is bounded by ``max_entries`` too: rows are stamped when
+    written or read from disk, and each write drops the least recently used
+    rows of the namespace beyond the bound.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        max_entries: int = 1024,
+        ttl: float = 86400.0,
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+        stale_ttl: float = 0.0,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.encode = encode
+        self.decode = decode
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+            if "used_at" not in columns:
+                # Files written before rows were stamped on use
+                conn.execute(
+                    "ALTER TABLE cache ADD COLUMN used_at REAL NOT NULL DEFAULT 0"
+                )
+                conn.execute("UPDATE cache SET used_at = created_at")
+            conn.execute(_USED_AT_INDEX)
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND created_at < ?",
+                (namespace, time.time() - ttl - stale_ttl),
+            )
+            conn.execute(_PRUNE, (namespace, max_entries))
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(self, key: str, value: Any, created_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def lookup(
+        self, key: str, allow_stale: bool = True
+    ) -> Optional[Tuple[Any, bool]]:
+        """Return ``(value, is_fresh)`` for ``key``, or None on a miss.
+
+        Entries past ``ttl`` but within ``stale_ttl`` come back with
+        ``is_fresh`` set to False, unless ``allow_stale`` is off.
+        """
+        now = time.time()
+        max_age = self.ttl + (self.stale_ttl if allow_stale else 0.0)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[1]
+                if age <= max_age:
+                    self._entries.move_to_end(key)
+                    self._count_hit(age, "memory")
+                    return entry[0], age <= self.ttl
+                del self._entries[key]
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM cache "
+                    "WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                if row is not None and now - row[1] <= max_age:
+                    conn.execute(
+                        "UPDATE cache SET used_at = ? WHERE namespace = ? AND key = ?",
+                        (now, self.namespace, key),
+                    )
+        except sqlite3.Error as e:
+            print(f"⚠️ Query cache read failed: {e}")
+            row = None
+
+        if row is None or now - row[1] > max_age:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        value = self.decode(row[0])
+        self._remember(key, value, row[1])
+        with self._lock:
+            self._count_hit(now - row[1], "disk")
+        return value, now - row[1] <= self.ttl
+
+    def _count_hit(self, age: float, tier: str) -> None:
+        if age > self.ttl:
+            self.stale_hits += 1
+        elif tier == "memory":
+            self.memory_hits += 1
+        else:
+            self.disk_hits += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the fresh cached value for ``key``, or None on a miss."""
+        entry = self.lookup(key, allow_stale=False)
+        return None if entry is None else entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        """Store ``value`` under ``key`` in memory and on disk."""
+        created_at = time.time()
+        self._remember(key, value, created_at)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache "
+                    "(namespace, key, value, created_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, self.encode(value), created_at, created_at),
+                )
+                conn.execute(_PRUNE, (self.namespace, self.max_entries))
+        except sqlite3.Error as e:
+            print(f"⚠️ Query cache write failed: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and the overall hit rate since startup."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits + self.stale_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,171 @@
+"""Guarded execution of generated Cypher.
+
+LLM-generated queries are planned with ``EXPLAIN`` first and rejected when
+they would write or when the planner expects more rows than
+``NEO4J_MAX_ESTIMATED_ROWS`` (an unbounded cartesian product, for example).
+Accepted queries get a ``LIMIT``, run in a read session with a transaction
+timeout, and their results are streamed with a small fetch size and cut off
+after ``NEO4J_MAX_RESULT_ROWS`` rows.
+"""
+
+import os
+import re
+import threading
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+from neo4j import READ_ACCESS, Query
+from neo4j.exceptions import Neo4jError
+
+NEO4J_MAX_ESTIMATED_ROWS = float(os.getenv("NEO4J_MAX_ESTIMATED_ROWS", "1000000"))
+NEO4J_MAX_RESULT_ROWS = int(os.getenv("NEO4J_MAX_RESULT_ROWS", "1000"))
+NEO4J_QUERY_TIMEOUT = float(os.getenv("NEO4J_QUERY_TIMEOUT", "10"))
+NEO4J_GUARD_FETCH_SIZE = int(os.getenv("NEO4J_GUARD_FETCH_SIZE", "100"))
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`")
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+(\d+)\s*$", re.IGNORECASE)
+
+
+class QueryRejected(Exception):
+    """A query was refused before running (write access or estimated cost)."""
+
+
+def estimated_rows(plan: Optional[Dict[str, Any]]) -> float:
+    """Largest ``EstimatedRows`` of any operator in an ``EXPLAIN`` plan."""
+    if not plan:
+        return 0.0
+    own = float(plan.get("args", {}).get("EstimatedRows", 0))
+    return max([own] + [estimated_rows(child) for child in plan.get("children", [])])
+
+
+def enforce_limit(cypher: str, max_rows: int) -> str:
+    """Cap the rows returned by ``cypher`` at ``max_rows`` with a LIMIT.
+
+    A final numeric LIMIT above ``max_rows`` is lowered; one is appended when
+    the query ends with a plain RETURN. Queries ending otherwise (UNION,
+    subqueries, parameterized limits) are left alone, their rows are only
+    capped while fetching.
+    """
+    text = cypher.strip().rstrip(";").rstrip()
+    # Blank out literals so keywords inside names are not mistaken for clauses
+    masked = _STRING_LITERAL.sub(lambda m: " " * len(m.group(0)), text)
+
+    limit = _TRAILING_LIMIT.search(masked)
+    if limit:
+        if int(limit.group(1)) <= max_rows:
+            return text
+        return f"{text[: limit.start(1)]}{max_rows}"
+
+    returns = [m.start() for m in re.finditer(r"\bRETURN\b", masked, re.IGNORECASE)]
+    if not returns or re.search(r"\bUNION\b", masked, re.IGNORECASE):
+        return text
+    tail = masked[returns[-1] :]
+    if "}" in tail or re.search(r"\bLIMIT\b", tail, re.IGNORECASE):
+        return text
+    return f"{text}\nLIMIT {max_rows}"
+
+
+class QueryGuard:
+    """Runs untrusted read queries within cost, row and time limits."""
+
+    def __init__(
+        self,
+        driver,
+        database: Optional[str] = None,
+        max_estimated_rows: float = NEO4J_MAX_ESTIMATED_ROWS,
+        max_rows: int = NEO4J_MAX_RESULT_ROWS,
+        timeout: float = NEO4J_QUERY_TIMEOUT,
+        fetch_size: int = NEO4J_GUARD_FETCH_SIZE,
+    ):
+        self.driver = driver
+        self.database = database
+        self.max_estimated_rows = max_estimated_rows
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.fetch_size = fetch_size
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def run(self, cypher: str, params: Optional[dict] = None) -> List[Dict[str, Any]]:
+        """Rows of ``cypher``; raises ``QueryRejected`` if it is refused."""
+        params = params or {}
+        cypher = enforce_limit(cypher, self.max_rows)
+        with self.driver.session(
+            database=self.database,
+            fetch_size=self.fetch_size,
+            default_access_mode=READ_ACCESS,
+        ) as session:
+            summary = session.run(
+                Query(f"EXPLAIN {cypher}", timeout=self.timeout), params
+            ).consume()
+            if summary.query_type not in ("r", None):
+                self._reject(f"only read queries are allowed: {cypher}")
+            estimate = estimated_rows(summary.plan)
+            if estimate > self.max_estimated_rows:
+                self._reject(
+                    f"estimated {estimate:,.0f} rows exceeds "
+                    f"{self.max_estimated_rows:,.0f}: {cypher}"
+                )
+
+            try:
+                result = session.run(Query(cypher, timeout=self.timeout), params)
+                rows = [record.data() for record in islice(result, self.max_rows)]
+            except Neo4jError as e:
+                if "TransactionTimedOut" in (e.code or ""):
+                    with self._lock:
+                        self.timed_out += 1
+                    print(f"⏱️ Query timed out after {self.timeout:g}s: {cypher}")
+                raise
+        with self._lock:
+            self.executed += 1
+        return rows
+
+    def _reject(self, reason: str) -> None:
+        with self._lock:
+            self.rejected += 1
+        print(f"🛑 Query rejected, {reason}")
+        raise QueryRejected(reason)
+
+    def stats(self) -> Dict[str, int]:
+        """Executed, rejected and timed out queries since startup."""
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+class GuardedGraph:
+    """A LangChain graph whose ``query`` goes through a ``QueryGuard``.
+
+    Everything else (schema, enhanced schema flag...) is the wrapped graph's,
+    so the QA chain sees the same schema while its generated Cypher is
+    guarded.
+    """
+
+    def __init__(self, graph, guard: QueryGuard):
+        self._graph = graph
+        self.guard = guard
+
+    def __getattr__(self, name):
+        return getattr(self._graph, name)
+
+    @property
+    def get_schema(self) -> str:
+        return self._graph.get_schema
+
+    @property
+    def get_structured_schema(self) -> Dict[str, Any]:
+        return self._graph.get_structured_schema
+
+    def query(self, query: str, params: dict = {}) -> List[Dict[str, Any]]:
+        return self.guard.run(query, params)
+
+    def refresh_schema(self) -> None:
+        self._graph.refresh_schema()
+
+    def add_graph_documents(self, graph_documents, include_source: bool = False):
+        raise QueryRejected("the guarded graph is read-only")
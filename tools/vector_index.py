@@ -0,0 +1,248 @@
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from tools.ann_index import IVFIndex
+from tools.lexical_index import LexicalIndex
+
+VECTORS_FILE = "vectors.bin"
+NORMS_FILE = "norms.npy"
+CHUNKS_FILE = "chunks.json"
+META_FILE = "meta.json"
+
+# Bumped whenever the on-disk layout gains files, so that index directories
+# named after their contents are rebuilt rather than reused.
+FORMAT_VERSION = 2
+
+# Rows scored per block when the matrix is stored as float16, to bound the
+# size of the float32 temporaries created by the upcast.
+_SEARCH_BLOCK_ROWS = 65536
+
+# Approximate search knobs: indexes with at least ANN_MIN_ROWS rows get an IVF
+# index with ANN_LISTS cells (0 = automatic); queries scan ANN_NPROBE cells.
+ANN_MIN_ROWS = int(os.getenv("PDF_ANN_MIN_ROWS", "20000"))
+ANN_LISTS = int(os.getenv("PDF_ANN_LISTS", "0"))
+ANN_NPROBE = int(os.getenv("PDF_ANN_NPROBE", "8"))
+
+
+class VectorIndex:
+    """Read-only, memory-mapped index of chunk embeddings.
+
+    On disk an index is a directory holding a contiguous row-major matrix of
+    unit-normalized vectors (``vectors.bin``), the original L2 norm of every
+    row (``norms.npy``), a table of chunk texts and metadata (``chunks.json``)
+    and a small ``meta.json`` header. The matrix is opened with ``np.memmap``,
+    so every process on a host shares one page-cached copy. Every index also
+    carries a BM25 ``LexicalIndex`` over the chunk texts, and large indexes an
+    ``IVFIndex`` used for approximate search.
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        vectors: np.ndarray,
+        norms: np.ndarray,
+        docs: List[Document],
+        meta: dict,
+        ivf: Optional[IVFIndex] = None,
+        lexical: Optional[LexicalIndex] = None,
+    ):
+        self.index_dir = index_dir
+        self.vectors = vectors
+        self.norms = norms
+        self.docs = docs
+        self.meta = meta
+        self.ivf = ivf
+        self.lexical = lexical
+        self._groups: Dict[str, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @staticmethod
+    def build(
+        index_dir: str,
+        docs: List[Document],
+        vectors,
+        model: str,
+        dtype: str = "float32",
+        key: Optional[str] = None,
+        ann_min_rows: int = ANN_MIN_ROWS,
+        ann_lists: int = ANN_LISTS,
+    ) -> None:
+        """Write an index for ``docs`` and their ``vectors`` to ``index_dir``.
+
+        The index is assembled in a temporary directory and renamed into place,
+        so concurrent readers only ever see a complete index. Index directories
+        are meant to be content-addressed: if ``index_dir`` already exists, the
+        existing index is kept. Indexes with at least ``ann_min_rows`` rows
+        also get an IVF index with ``ann_lists`` cells (0 picks a default).
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported index dtype: {dtype}")
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(docs):
+            raise ValueError(
+                f"Expected {len(docs)} vectors, got array of shape {matrix.shape}"
+            )
+
+        norms = np.linalg.norm(matrix, axis=1).astype(np.float32)
+        safe_norms = np.where(norms > 0, norms, 1.0)
+        normalized = (matrix / safe_norms[:, None]).astype(dtype)
+
+        parent = os.path.dirname(os.path.abspath(index_dir))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = f"{index_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        normalized.tofile(os.path.join(tmp_dir, VECTORS_FILE))
+        np.save(os.path.join(tmp_dir, NORMS_FILE), norms)
+        LexicalIndex.build([doc.page_content for doc in docs]).save(tmp_dir)
+        if normalized.shape[0] >= max(ann_min_rows, 1):
+            IVFIndex.train(normalized, n_lists=ann_lists or None).save(tmp_dir)
+        with open(os.path.join(tmp_dir, CHUNKS_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                [
+                    {"page_content": doc.page_content, "metadata": doc.metadata}
+                    for doc in docs
+                ],
+                f,
+            )
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "rows": int(normalized.shape[0]),
+                    "dim": int(normalized.shape[1]),
+                    "dtype": dtype,
+                    "model": model,
+                    "key": key,
+                    "format_version": FORMAT_VERSION,
+                },
+                f,
+            )
+
+        try:
+            os.rename(tmp_dir, index_dir)
+        except OSError:
+            # Another process already published an index under this name.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(os.path.join(index_dir, META_FILE)):
+                raise
+
+    @classmethod
+    def load(cls, index_dir: str, nprobe: int = ANN_NPROBE) -> "VectorIndex":
+        """Open an index previously written by ``build``."""
+        with open(os.path.join(index_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(index_dir, CHUNKS_FILE), "r", encoding="utf-8") as f:
+            records = json.load(f)
+
+        rows, dim = meta["rows"], meta["dim"]
+        if rows:
+            vectors = np.memmap(
+                os.path.join(index_dir, VECTORS_FILE),
+                dtype=meta["dtype"],
+                mode="r",
+                shape=(rows, dim),
+            )
+        else:
+            vectors = np.zeros((0, dim), dtype=meta["dtype"])
+        norms = np.load(os.path.join(index_dir, NORMS_FILE), mmap_mode="r")
+
+        docs = [
+            Document(page_content=r["page_content"], metadata=r["metadata"])
+            for r in records
+        ]
+        ivf = IVFIndex.load(index_dir, nprobe)
+        lexical = LexicalIndex.load(index_dir)
+        return cls(index_dir, vectors, norms, docs, meta, ivf, lexical)
+
+    def raw_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Return the original (un-normalized) float32 vectors of ``rows``."""
+        return np.asarray(self.vectors[rows], dtype=np.float32) * np.asarray(
+            self.norms[rows], dtype=np.float32
+        )[:, None]
+
+    def _group(self, field: str) -> Dict:
+        """Map each value of a metadata field to the rows that carry it.
+
+        List-valued fields (such as ``years``) index every element.
+        """
+        groups = self._groups.get(field)
+        if groups is None:
+            members: Dict = {}
+            for row, doc in enumerate(self.docs):
+                value = doc.metadata.get(field)
+                for item in value if isinstance(value, list) else [value]:
+                    members.setdefault(item, []).append(row)
+            groups = {v: np.asarray(r, dtype=np.int64) for v, r in members.items()}
+            self._groups[field] = groups
+        return groups
+
+    def values_of(self, field: str) -> List:
+        """Return the distinct values of a metadata field."""
+        return [v for v in self._group(field) if v is not None]
+
+    def rows_where(self, field: str, value) -> np.ndarray:
+        """Return the rows whose metadata ``field`` equals (or contains) ``value``."""
+        return self._group(field).get(value, np.empty(0, dtype=np.int64))
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Cosine similarity of ``query`` against every row (or only ``rows``)."""
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if vectors.dtype == np.float32:
+            return vectors @ query
+
+        scores = np.empty(vectors.shape[0], dtype=np.float32)
+        for start in range(0, vectors.shape[0], _SEARCH_BLOCK_ROWS):
+            block = vectors[start : start + _SEARCH_BLOCK_ROWS]
+            scores[start : start + len(block)] = block.astype(np.float32) @ query
+        return scores
+
+    def search(
+        self,
+        query_vector,
+        k: int = 4,
+        rows: Optional[np.ndarray] = None,
+        exact: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the row indices and cosine scores of the ``k`` nearest rows.
+
+        If ``rows`` is given, only those rows are considered. Unfiltered
+        searches go through the IVF index when there is one, unless ``exact``
+        is set; filtered searches always scan their subset exactly.
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm > 0:
+            query = query / query_norm
+
+        if self.ivf is not None and rows is None and not exact:
+            return self.ivf.search(self.vectors, query, k)
+
+        n = self.vectors.shape[0] if rows is None else len(rows)
+        if n == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = self._scores(query, rows)
+        k = min(k, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(n)
+        order = top[np.argsort(-scores[top], kind="stable")]
+        indices = order if rows is None else np.asarray(rows)[order]
+        return indices, scores[order]
+
+    def similarity_search_by_vector(
+        self, query_vector, k: int = 4, rows: Optional[np.ndarray] = None
+    ) -> List[Document]:
+        """Return the ``k`` chunks most similar to ``query_vector``."""
+        indices, _ = self.search(query_vector, k, rows)
+        return [self.docs[i] for i in indices]